@@ -6,8 +6,16 @@ import time
 import sys
 import json
 import argparse
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
+try:
+    import orjson  # optional, faster JSON encoder
+except ImportError:
+    orjson = None
+
 # =========================
 # CONFIG
 # =========================
@@ -23,9 +31,33 @@ TEMPLATE_NAME = "template_project"
 TEMPLATE_BLEND = "template.blend"
 TEMPLATE_SVG2IFC = "svg2ifc.py"
 
+# Template files that are never written in place -> safe to hardlink into projects
+HARDLINK_SUFFIXES = (".blend", ".py")
+
+# Lines of Blender stdout/stderr kept in memory per stream
+LOG_TAIL_LINES = 200
+
+# Whitelist of output files (Files you WANT), matched case-insensitively anywhere in the name
+# so "A01 - Grundriss.pdf" matches "grundriss.pdf":
+#   plan.dxf      -> "My Story plan.dxf" or just "plan.dxf"
+#   grundriss.pdf -> "A01 Grundriss.pdf"
+#   model.ifc     -> handled separately, but listed for clarity
+# Cheap suffix pre-filter; every whitelist entry ends in one of these
+WANTED_EXTS = frozenset((".dxf", ".pdf", ".ifc"))
+WANTED_RE = re.compile(r"(?:plan\.dxf|grundriss\.pdf|model\.ifc)", re.IGNORECASE)
+
 # =========================
 # UTILS
 # =========================
+def emit_json(obj):
+    """Write the result JSON (one line) to stdout for the Node caller."""
+    if orjson is not None:
+        sys.stdout.flush()
+        sys.stdout.buffer.write(orjson.dumps(obj) + b"\n")
+        sys.stdout.buffer.flush()
+    else:
+        print(json.dumps(obj))
+
 def slugify(name: str) -> str:
     name = (name or "").strip()
     if not name: name = "project"
@@ -35,16 +67,35 @@ def slugify(name: str) -> str:
 
 def unique_project_dir(base_slug: str) -> Path:
     PROJECTS_DIR.mkdir(parents=True, exist_ok=True)
-    p = PROJECTS_DIR / base_slug
-    if not p.exists(): return p
+    # One directory listing instead of a stat() per candidate name
+    with os.scandir(PROJECTS_DIR) as it:
+        existing = {e.name for e in it}
+    if base_slug not in existing: return PROJECTS_DIR / base_slug
     for i in range(2, 1000):
-        p2 = PROJECTS_DIR / f"{base_slug}_{i}"
-        if not p2.exists(): return p2
+        name = f"{base_slug}_{i}"
+        if name not in existing: return PROJECTS_DIR / name
     return PROJECTS_DIR / f"{base_slug}_{int(time.time())}"
 
-def run_blender_direct(project_dir: Path):
+def _link_or_copy(src, dst):
+    """
+    copytree copy_function: hardlink files the job only reads (the .blend and
+    scripts) instead of copying their bytes. Everything else is copied, because
+    Bonsai/svg2ifc rewrite IFC, SVG layouts, etc. in place, which would also
+    change the shared template inode.
+    """
+    if src.lower().endswith(HARDLINK_SUFFIXES):
+        try:
+            os.link(src, dst)
+            return dst
+        except OSError:
+            pass  # cross-device, unsupported filesystem, ...
+    return shutil.copy2(src, dst)
+
+def run_blender_direct(project_dir: Path, extra_scripts=()):
     """
     Runs Blender directly on the blend file, executing the script.
+    Any extra_scripts are run afterwards in the same Blender process
+    (one --python flag each), so they share a single Blender startup.
     """
     blend_file = project_dir / TEMPLATE_BLEND
     script_file = project_dir / TEMPLATE_SVG2IFC
@@ -56,16 +107,33 @@ def run_blender_direct(project_dir: Path):
         "--python-exit-code", "1", 
         "--python", str(script_file) 
     ]
+    for extra in extra_scripts:
+        cmd += ["--python", str(extra)]
     
-    proc = subprocess.run(
+    proc = subprocess.Popen(
         cmd, 
         cwd=str(project_dir), 
-        capture_output=True, 
-        text=True, 
-        errors="replace",
-        env=os.environ.copy()
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
     )
-    return proc.returncode, proc.stdout, proc.stderr
+
+    # Drain both pipes concurrently, keeping only the tail of each log
+    # (main() only reports the last few thousand chars anyway).
+    # Pipes stay binary; only the kept tail is decoded, once, at the end.
+    out_tail = deque(maxlen=LOG_TAIL_LINES)
+    err_tail = deque(maxlen=LOG_TAIL_LINES)
+    readers = [
+        threading.Thread(target=out_tail.extend, args=(proc.stdout,), daemon=True),
+        threading.Thread(target=err_tail.extend, args=(proc.stderr,), daemon=True),
+    ]
+    for t in readers:
+        t.start()
+    rc = proc.wait()
+    for t in readers:
+        t.join()
+    out = b"".join(out_tail).decode("utf-8", "replace")
+    err = b"".join(err_tail).decode("utf-8", "replace")
+    return rc, out, err
 
 def collect_outputs(project_dir: Path):
     files = []
@@ -74,7 +142,8 @@ def collect_outputs(project_dir: Path):
     if (project_dir / "generated.ifc").exists():
         files.append({"name": "Model.ifc", "path": f"/projects/{project_dir.name}/generated.ifc"})
 
-    # 2. Define the Search Directories
+    # 2. Define the Search Directories (in priority order: for duplicate
+    #    names the file from the earliest dir wins)
     search_dirs = [
         project_dir / "exports" / "_FLAT",
         project_dir / "exports",
@@ -83,103 +152,122 @@ def collect_outputs(project_dir: Path):
         project_dir / "sheets"
     ]
 
-    # 3. Define the Whitelist (Files you WANT)
-    # We use partial matching so "A01 - Grundriss.pdf" matches "Grundriss"
-    wanted_keywords = [
-        "plan.dxf",      # Covers "My Story plan.dxf" or just "plan.dxf"
-        "grundriss.pdf", # Covers "A01 Grundriss.pdf"
-        "model.ifc"      # Handled above, but listed for clarity
-    ]
-
-    seen_names = set()
+    # name -> file entry; insertion-ordered, so output follows dir priority
+    found = {}
 
     for d in search_dirs:
-        if d.exists():
-            for f in d.glob("*.*"):
-                fname_lower = f.name.lower()
-                
-                # CHECK: Is this file in our whitelist?
-                is_wanted = False
-                for kw in wanted_keywords:
-                    if kw in fname_lower:
-                        is_wanted = True
-                        break
-                
-                if is_wanted and f.name not in seen_names:
-                    try:
-                        # Build relative path for URL
-                        rel_dir = d.relative_to(PROJECTS_DIR)
-                        web_path = f"/projects/{rel_dir.as_posix()}/{f.name}"
-                    except ValueError:
-                        # Fallback path logic
-                        try:
-                            rel_dir = d.relative_to(project_dir)
-                            web_path = f"/projects/{project_dir.name}/{rel_dir.as_posix()}/{f.name}"
-                        except:
-                            continue
-
-                    files.append({"name": f.name, "path": web_path})
-                    seen_names.add(f.name)
+        # Web path prefix for this dir, computed once instead of per file
+        try:
+            prefix = f"/projects/{d.relative_to(PROJECTS_DIR).as_posix()}/"
+        except ValueError:
+            # Fallback path logic
+            try:
+                prefix = f"/projects/{project_dir.name}/{d.relative_to(project_dir).as_posix()}/"
+            except ValueError:
+                continue
 
-    return files
+        # Missing dirs are simply skipped - no separate exists() check
+        try:
+            it = os.scandir(str(d))
+        except FileNotFoundError:
+            continue
+        # os.scandir yields DirEntry objects: names + file type without a stat() per entry
+        with it:
+            for entry in it:
+                if not entry.is_file(follow_symlinks=False):
+                    continue
+                name = entry.name
 
-def main():
-    parser = argparse.ArgumentParser()
-    parser.add_argument("--svg", required=True)
-    parser.add_argument("--name", default="my_project")
-    args = parser.parse_args()
+                # CHECK: Is this file in our whitelist? (suffix first, e.g. skips .png thumbnails)
+                if name[-4:].lower() not in WANTED_EXTS or not WANTED_RE.search(name):
+                    continue
 
+                if name not in found:
+                    found[name] = {"name": name, "path": prefix + name}
+
+    files.extend(found.values())
+    return files
+
+def process_one(svg_path, project_dir: Path):
+    """
+    Full pipeline for one SVG (template copy + Blender + cleanup + outputs).
+    project_dir is already reserved (created empty) by main().
+    Returns the JSON-able result dict.
+    """
     try:
-        # 1. Setup Project Folder
-        base = slugify(args.name)
-        project_dir = unique_project_dir(base)
-        
         src_template = TEMPLATES_DIR / TEMPLATE_NAME
-        if not src_template.exists():
-            print(json.dumps({"success": False, "error": f"Template missing at {src_template}"}))
-            return
-            
-        shutil.copytree(src_template, project_dir)
-        shutil.copy2(args.svg, project_dir / "plan.svg")
+        shutil.copytree(src_template, project_dir, copy_function=_link_or_copy, dirs_exist_ok=True)
+        # Fresh file in a throwaway project dir: no metadata to preserve, and
+        # copyfile takes the sendfile/fast-copy path
+        shutil.copyfile(svg_path, project_dir / "plan.svg")
 
         # 2. Run Blender
-        rc, out, err = run_blender_direct(project_dir)
+        # 2b. The cleanup that removes IfcAnnotation from generated.ifc (optional post-processing)
+        # runs as a second --python script in the same Blender process; it skips itself
+        # when generated.ifc was not written.
+        cleanup_script = project_dir / "cleanup_annotations.py"
+        extra_scripts = [cleanup_script] if cleanup_script.exists() else []
+        rc, out, err = run_blender_direct(project_dir, extra_scripts)
 
         full_log = (out + "\n" + err).strip()
 
-        # 2b. Run cleanup to remove IfcAnnotation from generated.ifc (optional post-processing)
-        cleanup_script = project_dir / "cleanup_annotations.py"
-        if cleanup_script.exists() and (project_dir / "generated.ifc").exists():
-            try:
-                cleanup_result = subprocess.run(
-                    [sys.executable, str(cleanup_script)],
-                    cwd=str(project_dir),
-                    capture_output=True,
-                    text=True,
-                    timeout=30
-                )
-                full_log += "\n" + cleanup_result.stdout + cleanup_result.stderr
-            except Exception as cleanup_err:
-                full_log += f"\n[CLEANUP WARNING] {cleanup_err}"
-
         # 3. Return JSON
         if rc == 0:
             files = collect_outputs(project_dir)
-            print(json.dumps({
+            return {
                 "success": True,
                 "project_id": project_dir.name,
                 "files": files,
                 "logs": full_log[-3000:] 
-            }))
-        else:
-            print(json.dumps({
-                "success": False,
-                "error": "Blender process failed",
-                "logs": full_log[-3000:]
-            }))
+            }
+        return {
+            "success": False,
+            "error": "Blender process failed",
+            "logs": full_log[-3000:]
+        }
+
+    except Exception as e:
+        return {"success": False, "error": str(e), "logs": str(e)}
+
+def main():
+    parser = argparse.ArgumentParser()
+    # --svg/--name may be repeated to convert several plans in one call (names pair up with svgs)
+    parser.add_argument("--svg", action="append", required=True)
+    parser.add_argument("--name", action="append")
+    parser.add_argument("--jobs", type=int, default=min(4, os.cpu_count() or 1),
+                        help="Parallel Blender runs when several --svg are given")
+    args = parser.parse_args()
+
+    svgs = args.svg
+    names = args.name or ["my_project"]
+    names = names + [names[-1]] * (len(svgs) - len(names))
+
+    try:
+        src_template = TEMPLATES_DIR / TEMPLATE_NAME
+        if not src_template.exists():
+            emit_json({"success": False, "error": f"Template missing at {src_template}"})
+            return
+
+        # 1. Setup Project Folders
+        # Reserve every project dir up front (serially), so parallel jobs
+        # with the same name cannot pick the same folder.
+        project_dirs = []
+        for name in names[:len(svgs)]:
+            project_dir = unique_project_dir(slugify(name))
+            project_dir.mkdir()
+            project_dirs.append(project_dir)
+
+        if len(svgs) == 1:
+            emit_json(process_one(svgs[0], project_dirs[0]))
+            return
+
+        # Each job is one independent Blender subprocess -> run them side by side
+        with ProcessPoolExecutor(max_workers=max(1, args.jobs)) as ex:
+            results = list(ex.map(process_one, svgs, project_dirs))
+        emit_json(results)
 
     except Exception as e:
-        print(json.dumps({"success": False, "error": str(e), "logs": str(e)}))
+        emit_json({"success": False, "error": str(e), "logs": str(e)})
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,5 +1,5 @@
 # __run_inside_blender.py
-import argparse, os, sys, time
+import argparse, os, sys
 import bpy
 
 def log(msg): print(f"[WRAPPER] {msg}")
@@ -100,7 +100,7 @@ def main():
     if args.ifc:
         try_reload_ifc_only_if_needed(os.path.abspath(args.ifc))
 
-    time.sleep(0.2)
+    # open_mainfile/reload_ifc_file are synchronous, no need to wait before running the script
     execute_script(args.script)
 
 if __name__ == "__main__":
@@ -19,8 +19,12 @@ Usage:
 import sys
 import os
 import argparse
+import importlib.machinery
 import importlib.util
 
+# Set EB_VERBOSE=1 for per-SVG / per-collection progress output
+VERBOSE = bool(os.environ.get("EB_VERBOSE"))
+
 
 def export_meshes_to_ifc(mesh_objects, output_path):
     """
@@ -36,12 +40,17 @@ def export_meshes_to_ifc(mesh_objects, output_path):
     print("[IFC] Bonsai IFC project created")
 
     # Step 2: Assign each result mesh as IfcBuildingElementProxy
+    # Deselect everything once, then only toggle the previous/current object
+    bpy.ops.object.select_all(action='DESELECT')
+    prev = None
     for obj in mesh_objects:
         if obj.type != 'MESH':
             continue
-        bpy.ops.object.select_all(action='DESELECT')
+        if prev is not None:
+            prev.select_set(False)
         obj.select_set(True)
         bpy.context.view_layer.objects.active = obj
+        prev = obj
         bpy.ops.bim.assign_class(
             ifc_class="IfcBuildingElementProxy",
             predefined_type="NOTDEFINED",
@@ -85,13 +94,13 @@ def main():
         sys.exit(1)
 
     # Clear the scene first
+    # batch_remove deletes all IDs in one pass, without the operator/undo overhead
+    # of select_all + delete and per-collection remove() calls
     print("[RUNNER] Clearing scene...")
-    bpy.ops.object.select_all(action='SELECT')
-    bpy.ops.object.delete(use_global=False)
+    bpy.data.batch_remove(ids=list(bpy.data.objects))
 
     # Also clear any existing collections (except Scene Collection)
-    for coll in list(bpy.data.collections):
-        bpy.data.collections.remove(coll)
+    bpy.data.batch_remove(ids=list(bpy.data.collections))
 
     # Load the add-on from file path
     addon_path = os.path.abspath(args.addon)
@@ -101,23 +110,16 @@ def main():
         print(f"[ERROR] Add-on file not found: {addon_path}")
         sys.exit(1)
 
-    # If addon_path doesn't end in .py, we need to copy/rename it temporarily
-    # or use exec() to load the code directly
+    # addon_path may not end in .py (e.g. "3dBuilder"), so pass an explicit
+    # SourceFileLoader - it still caches compiled bytecode in __pycache__
     try:
-        # Read the file content and execute it
         print("[RUNNER] Loading add-on code...")
-        with open(addon_path, 'r', encoding='utf-8') as f:
-            addon_code = f.read()
-
-        # Create a module namespace
-        import types
-        eb_module = types.ModuleType("elevation_builder")
-        eb_module.__file__ = addon_path
-
-        # Execute the code in the module's namespace
-        exec(addon_code, eb_module.__dict__)
+        loader = importlib.machinery.SourceFileLoader("elevation_builder", addon_path)
+        spec = importlib.util.spec_from_file_location("elevation_builder", addon_path, loader=loader)
+        eb_module = importlib.util.module_from_spec(spec)
 
         sys.modules["elevation_builder"] = eb_module
+        spec.loader.exec_module(eb_module)
         print("[RUNNER] Add-on module loaded")
     except Exception as e:
         print(f"[ERROR] Failed to load add-on module: {e}")
@@ -171,11 +173,13 @@ def main():
     for svg_name in svg_files:
         svg_path = os.path.join(svgs_dir, svg_name)
         if os.path.exists(svg_path):
-            print(f"[RUNNER] Importing {svg_name}...")
+            if VERBOSE:
+                print(f"[RUNNER] Importing {svg_name}...")
             try:
                 bpy.ops.import_curve.svg(filepath=svg_path)
                 imported_count += 1
-                print(f"[RUNNER] Successfully imported {svg_name}")
+                if VERBOSE:
+                    print(f"[RUNNER] Successfully imported {svg_name}")
             except Exception as e:
                 print(f"[WARNING] Failed to import {svg_name}: {e}")
         else:
@@ -185,11 +189,11 @@ def main():
         print("[ERROR] No SVGs were imported!")
         sys.exit(1)
 
-    # List imported collections
-    print(f"[RUNNER] Collections after import: {[c.name for c in bpy.data.collections]}")
+    print(f"[RUNNER] Imported {imported_count}/{len(svg_files)} SVG(s)")
 
-    # List imported collections (brief)
-    print(f"[RUNNER] Imported collections: {[c.name for c in bpy.data.collections]}")
+    # List imported collections
+    if VERBOSE:
+        print(f"[RUNNER] Imported collections: {[c.name for c in bpy.data.collections]}")
 
     # Run align panels operator
     print("[RUNNER] Running align_panels...")
@@ -237,16 +241,24 @@ def main():
         print(f"[RUNNER] Found {len(result_objs)} result object(s): {[o.name for o in result_objs]}")
 
         # Set all result meshes to standard white material (like default cube)
-        white_mat = bpy.data.materials.new(name="Elemente_White")
-        white_mat.use_nodes = True
-        bsdf = white_mat.node_tree.nodes.get("Principled BSDF")
-        if bsdf:
-            bsdf.inputs["Base Color"].default_value = (0.8, 0.8, 0.8, 1.0)
-            bsdf.inputs["Roughness"].default_value = 0.5
+        # Reuse it if the blend already has one
+        white_mat = bpy.data.materials.get("Elemente_White")
+        if white_mat is None:
+            white_mat = bpy.data.materials.new(name="Elemente_White")
+            white_mat.use_nodes = True
+            bsdf = white_mat.node_tree.nodes.get("Principled BSDF")
+            if bsdf:
+                bsdf.inputs["Base Color"].default_value = (0.8, 0.8, 0.8, 1.0)
+                bsdf.inputs["Roughness"].default_value = 0.5
         for obj in result_objs:
             if obj.type == 'MESH':
-                obj.data.materials.clear()
-                obj.data.materials.append(white_mat)
+                # Overwrite existing slots in place instead of clear() + append()
+                mats = obj.data.materials
+                if len(mats):
+                    for i in range(len(mats)):
+                        mats[i] = white_mat
+                else:
+                    mats.append(white_mat)
         print(f"[RUNNER] Applied white material to {len(result_objs)} object(s)")
 
         # Select all result objects for export
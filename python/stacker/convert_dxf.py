@@ -5,12 +5,187 @@ Uses raw text parsing as fallback for malformed DXF files.
 """
 import ezdxf
 from ezdxf import recover
-from typing import List, Dict, Tuple, Set
+from typing import List, Dict, Tuple
 import math
 import base64
-import tempfile
-import os
+import io
 import re
+import numpy as np
+
+
+# DXF group code line followed by its value line; re.M so a non-numeric line
+# just makes the scan resync at the next line
+_DXF_PAIR_RE = re.compile(r'^[ \t]*([+-]?\d+)[ \t\r]*\n([^\n]*)', re.M)
+# "2 / ENTITIES" section name pair and the "0 / ENDSEC" pair that closes it
+_DXF_ENTITIES_RE = re.compile(r'^[ \t]*0*2[ \t\r]*\n[ \t]*ENTITIES[ \t\r]*$', re.M)
+_DXF_ENDSEC_RE = re.compile(r'^[ \t]*0+[ \t\r]*\n[ \t]*ENDSEC[ \t\r]*$', re.M)
+
+# Corner dedupe grid (SVG units = m, so 1e-4 = 0.1 mm)
+CORNER_SNAP = 1e-4
+
+_SVG_LINE_FMT = b'<line x1="%.4f" y1="%.4f" x2="%.4f" y2="%.4f"/>'
+
+
+def _arc_segments(cx: float, cy: float, r: float, sa: float, ea: float, segs: int) -> np.ndarray:
+    """
+    Tessellate an arc (angles in radians) into `segs` straight segments.
+    Returns an (segs, 4) array of [x1, y1, x2, y2] rows.
+    """
+    a = sa + (ea - sa) * np.arange(segs + 1) / segs
+    xs = cx + r * np.cos(a)
+    ys = cy + r * np.sin(a)
+    return np.stack([xs[:-1], ys[:-1], xs[1:], ys[1:]], axis=1)
+
+
+def _tessellate_arcs(arcs: np.ndarray) -> np.ndarray:
+    """
+    Tessellate many arcs at once. `arcs` rows are [cx, cy, r, sa, ea, segs]
+    (angles in radians); same angles and row order as _arc_segments per arc.
+    """
+    segs = arcs[:, 5].astype(np.int64)
+    row = np.repeat(np.arange(len(segs)), segs)
+    starts = np.cumsum(segs) - segs
+    k = np.arange(len(row)) - starts[row]
+    cx, cy, r, sa, ea = arcs[row, :5].T
+    n = segs[row]
+    span = ea - sa
+    a1 = sa + span * k / n
+    a2 = sa + span * (k + 1) / n
+    return np.stack([cx + r * np.cos(a1), cy + r * np.sin(a1),
+                     cx + r * np.cos(a2), cy + r * np.sin(a2)], axis=1)
+
+
+def _circle_segments(centers: np.ndarray, radii: np.ndarray, segs: int = 32) -> np.ndarray:
+    """Tessellate many circles at once; returns (len(radii) * segs, 4) rows."""
+    a = 2 * math.pi * np.arange(segs + 1) / segs
+    xs = centers[:, 0:1] + radii[:, None] * np.cos(a)
+    ys = centers[:, 1:2] + radii[:, None] * np.sin(a)
+    return np.stack([xs[:, :-1], ys[:, :-1], xs[:, 1:], ys[:, 1:]], axis=2).reshape(-1, 4)
+
+
+def _ezdxf_segments(msp) -> List[np.ndarray]:
+    """
+    Collect modelspace LINE / LWPOLYLINE / CIRCLE / ARC geometry as (N, 4) segment arrays.
+    One query() per entity type; circles and arcs are each tessellated in a single batch.
+    """
+    chunks = []
+
+    rows = []
+    for entity in msp.query('LINE'):
+        try:
+            start, end = entity.dxf.start, entity.dxf.end
+            rows.append((start[0], start[1], end[0], end[1]))
+        except Exception as e:
+            print(f"Skipping entity: {e}")
+    if rows:
+        chunks.append(np.array(rows, dtype=np.float64))
+
+    for entity in msp.query('LWPOLYLINE'):
+        try:
+            pts = np.array(list(entity.get_points('xy')), dtype=np.float64).reshape(-1, 2)
+            if entity.closed and len(pts) > 2:
+                pts = np.vstack([pts, pts[:1]])
+            if len(pts) > 1:
+                chunks.append(np.hstack([pts[:-1], pts[1:]]))
+        except Exception as e:
+            print(f"Skipping entity: {e}")
+
+    circles = []
+    for entity in msp.query('CIRCLE'):
+        try:
+            center = entity.dxf.center
+            circles.append((center[0], center[1], entity.dxf.radius))
+        except Exception as e:
+            print(f"Skipping entity: {e}")
+    if circles:
+        c = np.array(circles, dtype=np.float64)
+        chunks.append(_circle_segments(c[:, :2], c[:, 2]))
+
+    arcs = []
+    for entity in msp.query('ARC'):
+        try:
+            center = entity.dxf.center
+            sa = math.radians(entity.dxf.start_angle)
+            ea = math.radians(entity.dxf.end_angle)
+            if ea < sa:
+                ea += 2 * math.pi
+            segs = max(8, int((ea - sa) / (math.pi / 16)))
+            arcs.append((center[0], center[1], entity.dxf.radius, sa, ea, segs))
+        except Exception as e:
+            print(f"Skipping entity: {e}")
+    if arcs:
+        chunks.append(_tessellate_arcs(np.array(arcs, dtype=np.float64)))
+
+    return chunks
+
+
+def _as_line_tuples(segs: np.ndarray) -> List[Tuple[Tuple[float, float], Tuple[float, float]]]:
+    return [((x1, y1), (x2, y2)) for x1, y1, x2, y2 in segs.tolist()]
+
+
+def _emit_line(data: Dict, points: List, lines: List) -> None:
+    if not data:
+        return
+    try:
+        x1 = float(data.get(10, 0))
+        y1 = float(data.get(20, 0))
+        x2 = float(data.get(11, 0))
+        y2 = float(data.get(21, 0))
+        lines.append(((x1, y1), (x2, y2)))
+    except:
+        pass
+
+
+def _emit_lwpolyline(data: Dict, points: List, lines: List) -> None:
+    if not points:
+        return
+    # Check if closed (group code 70, bit 1)
+    is_closed = (int(data.get(70, 0)) & 1) == 1
+    lines.extend(zip(points, points[1:]))
+    if is_closed and len(points) > 2:
+        lines.append((points[-1], points[0]))
+
+
+def _emit_circle(data: Dict, points: List, lines: List) -> None:
+    if not data:
+        return
+    try:
+        cx = float(data.get(10, 0))
+        cy = float(data.get(20, 0))
+        r = float(data.get(40, 0))
+        lines.extend(_as_line_tuples(_arc_segments(cx, cy, r, 0.0, 2 * math.pi, 32)))
+    except:
+        pass
+
+
+def _emit_arc(data: Dict, points: List, lines: List) -> None:
+    if not data:
+        return
+    try:
+        cx = float(data.get(10, 0))
+        cy = float(data.get(20, 0))
+        r = float(data.get(40, 0))
+        sa = math.radians(float(data.get(50, 0)))
+        ea = math.radians(float(data.get(51, 0)))
+        if ea < sa:
+            ea += 2 * math.pi
+        segs = max(8, int((ea - sa) / (math.pi / 16)))
+        lines.extend(_as_line_tuples(_arc_segments(cx, cy, r, sa, ea, segs)))
+    except:
+        pass
+
+
+def _emit_nothing(data: Dict, points: List, lines: List) -> None:
+    pass
+
+
+# Raw parser: entity type -> handler(entity_data, polyline_points, lines)
+_RAW_ENTITY_HANDLERS = {
+    'LINE': _emit_line,
+    'LWPOLYLINE': _emit_lwpolyline,
+    'CIRCLE': _emit_circle,
+    'ARC': _emit_arc,
+}
 
 
 def parse_dxf_raw(content: str) -> List[Tuple[Tuple[float, float], Tuple[float, float]]]:
@@ -20,92 +195,26 @@ def parse_dxf_raw(content: str) -> List[Tuple[Tuple[float, float], Tuple[float,
     """
     lines = []
 
-    # Split into group code/value pairs
-    raw_lines = content.split('\n')
-    pairs = []
-    i = 0
-    while i < len(raw_lines) - 1:
-        try:
-            code = int(raw_lines[i].strip())
-            value = raw_lines[i + 1].strip()
-            pairs.append((code, value))
-            i += 2
-        except:
-            i += 1
+    # Find ENTITIES section: only that slice of the file gets tokenized
+    # (HEADER/TABLES/BLOCKS are skipped without being parsed)
+    m = _DXF_ENTITIES_RE.search(content)
+    if not m:
+        return lines
+    end = _DXF_ENDSEC_RE.search(content, m.end())
+    entities_text = content[m.end():end.start() if end else len(content)]
+
+    # Split into group code/value pairs (lines that aren't a group code are skipped)
+    pairs = [(int(code), value.strip()) for code, value in _DXF_PAIR_RE.findall(entities_text)]
 
-    # Find ENTITIES section
-    in_entities = False
     current_entity = None
     entity_data = {}
     polyline_points = []
 
     for code, value in pairs:
-        # Track section
-        if code == 2 and value == 'ENTITIES':
-            in_entities = True
-            continue
-        if code == 0 and value == 'ENDSEC':
-            in_entities = False
-            continue
-
-        if not in_entities:
-            continue
-
         # New entity starts
         if code == 0:
             # Process previous entity
-            if current_entity == 'LINE' and entity_data:
-                try:
-                    x1 = float(entity_data.get(10, 0))
-                    y1 = float(entity_data.get(20, 0))
-                    x2 = float(entity_data.get(11, 0))
-                    y2 = float(entity_data.get(21, 0))
-                    lines.append(((x1, y1), (x2, y2)))
-                except:
-                    pass
-
-            elif current_entity == 'LWPOLYLINE' and polyline_points:
-                # Check if closed (group code 70, bit 1)
-                is_closed = (int(entity_data.get(70, 0)) & 1) == 1
-                for j in range(len(polyline_points) - 1):
-                    lines.append((polyline_points[j], polyline_points[j + 1]))
-                if is_closed and len(polyline_points) > 2:
-                    lines.append((polyline_points[-1], polyline_points[0]))
-
-            elif current_entity == 'CIRCLE' and entity_data:
-                try:
-                    cx = float(entity_data.get(10, 0))
-                    cy = float(entity_data.get(20, 0))
-                    r = float(entity_data.get(40, 0))
-                    for k in range(32):
-                        a1 = 2 * math.pi * k / 32
-                        a2 = 2 * math.pi * (k + 1) / 32
-                        lines.append((
-                            (cx + r * math.cos(a1), cy + r * math.sin(a1)),
-                            (cx + r * math.cos(a2), cy + r * math.sin(a2))
-                        ))
-                except:
-                    pass
-
-            elif current_entity == 'ARC' and entity_data:
-                try:
-                    cx = float(entity_data.get(10, 0))
-                    cy = float(entity_data.get(20, 0))
-                    r = float(entity_data.get(40, 0))
-                    sa = math.radians(float(entity_data.get(50, 0)))
-                    ea = math.radians(float(entity_data.get(51, 0)))
-                    if ea < sa:
-                        ea += 2 * math.pi
-                    segs = max(8, int((ea - sa) / (math.pi / 16)))
-                    for k in range(segs):
-                        a1 = sa + (ea - sa) * k / segs
-                        a2 = sa + (ea - sa) * (k + 1) / segs
-                        lines.append((
-                            (cx + r * math.cos(a1), cy + r * math.sin(a1)),
-                            (cx + r * math.cos(a2), cy + r * math.sin(a2))
-                        ))
-                except:
-                    pass
+            _RAW_ENTITY_HANDLERS.get(current_entity, _emit_nothing)(entity_data, polyline_points, lines)
 
             # Start new entity
             current_entity = value
@@ -127,21 +236,7 @@ def parse_dxf_raw(content: str) -> List[Tuple[Tuple[float, float], Tuple[float,
             entity_data[code] = value
 
     # Process last entity
-    if current_entity == 'LINE' and entity_data:
-        try:
-            x1 = float(entity_data.get(10, 0))
-            y1 = float(entity_data.get(20, 0))
-            x2 = float(entity_data.get(11, 0))
-            y2 = float(entity_data.get(21, 0))
-            lines.append(((x1, y1), (x2, y2)))
-        except:
-            pass
-    elif current_entity == 'LWPOLYLINE' and polyline_points:
-        is_closed = (int(entity_data.get(70, 0)) & 1) == 1
-        for j in range(len(polyline_points) - 1):
-            lines.append((polyline_points[j], polyline_points[j + 1]))
-        if is_closed and len(polyline_points) > 2:
-            lines.append((polyline_points[-1], polyline_points[0]))
+    _RAW_ENTITY_HANDLERS.get(current_entity, _emit_nothing)(entity_data, polyline_points, lines)
 
     return lines
 
@@ -162,69 +257,21 @@ def convert_dxf_to_svg(dxf_content: bytes) -> Dict:
     """
     lines = []
 
-    # Try ezdxf first
-    temp_path = None
+    # Try ezdxf first (reads the uploaded bytes in memory, no temp file)
     try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.dxf', mode='wb') as f:
-            f.write(dxf_content)
-            temp_path = f.name
+        doc, auditor = recover.read(io.BytesIO(dxf_content))
+        print(f"DXF loaded with ezdxf recovery mode, {len(auditor.errors)} errors found")
 
-        try:
-            doc, auditor = recover.readfile(temp_path)
-            print(f"DXF loaded with ezdxf recovery mode, {len(auditor.errors)} errors found")
-
-            msp = doc.modelspace()
-            for entity in msp:
-                try:
-                    etype = entity.dxftype()
-                    if etype == 'LINE':
-                        lines.append((
-                            (entity.dxf.start.x, entity.dxf.start.y),
-                            (entity.dxf.end.x, entity.dxf.end.y)
-                        ))
-                    elif etype == 'LWPOLYLINE':
-                        points = list(entity.get_points('xy'))
-                        for i in range(len(points) - 1):
-                            lines.append((points[i], points[i + 1]))
-                        if entity.closed and len(points) > 2:
-                            lines.append((points[-1], points[0]))
-                    elif etype == 'CIRCLE':
-                        cx, cy = entity.dxf.center.x, entity.dxf.center.y
-                        r = entity.dxf.radius
-                        for i in range(32):
-                            a1 = 2 * math.pi * i / 32
-                            a2 = 2 * math.pi * (i + 1) / 32
-                            lines.append((
-                                (cx + r * math.cos(a1), cy + r * math.sin(a1)),
-                                (cx + r * math.cos(a2), cy + r * math.sin(a2))
-                            ))
-                    elif etype == 'ARC':
-                        cx, cy = entity.dxf.center.x, entity.dxf.center.y
-                        r = entity.dxf.radius
-                        sa = math.radians(entity.dxf.start_angle)
-                        ea = math.radians(entity.dxf.end_angle)
-                        if ea < sa:
-                            ea += 2 * math.pi
-                        segs = max(8, int((ea - sa) / (math.pi / 16)))
-                        for i in range(segs):
-                            a1 = sa + (ea - sa) * i / segs
-                            a2 = sa + (ea - sa) * (i + 1) / segs
-                            lines.append((
-                                (cx + r * math.cos(a1), cy + r * math.sin(a1)),
-                                (cx + r * math.cos(a2), cy + r * math.sin(a2))
-                            ))
-                except Exception as e:
-                    print(f"Skipping entity: {e}")
-                    continue
-        except Exception as e:
-            print(f"ezdxf failed: {e}, falling back to raw parser")
-            lines = []
-    finally:
-        if temp_path and os.path.exists(temp_path):
-            os.unlink(temp_path)
+        msp = doc.modelspace()
+        chunks = _ezdxf_segments(msp)
+        if chunks:
+            lines = np.concatenate(chunks)
+    except Exception as e:
+        print(f"ezdxf failed: {e}, falling back to raw parser")
+        lines = []
 
     # Fallback to raw parser if ezdxf failed or found nothing
-    if not lines:
+    if not len(lines):
         print("Using raw DXF parser...")
         try:
             content = dxf_content.decode('utf-8', errors='ignore')
@@ -233,14 +280,17 @@ def convert_dxf_to_svg(dxf_content: bytes) -> Dict:
         lines = parse_dxf_raw(content)
         print(f"Raw parser found {len(lines)} lines")
 
-    if not lines:
+    if not len(lines):
         raise ValueError("No geometry found in DXF file")
 
+    # SoA layout: one (N, 4) row per segment [x1, y1, x2, y2]
+    segs = np.asarray(lines, dtype=np.float64).reshape(-1, 4)
+    xs = segs[:, 0::2]
+    ys = segs[:, 1::2]
+
     # Calculate bounds - preserve original DXF coordinates (true scale)
-    all_x = [p[0] for line in lines for p in line]
-    all_y = [p[1] for line in lines for p in line]
-    min_x, max_x = min(all_x), max(all_x)
-    min_y, max_y = min(all_y), max(all_y)
+    min_x, max_x = float(xs.min()), float(xs.max())
+    min_y, max_y = float(ys.min()), float(ys.max())
 
     # Calculate raw dimensions
     raw_width = max_x - min_x
@@ -257,8 +307,7 @@ def convert_dxf_to_svg(dxf_content: bytes) -> Dict:
         print(f"Assuming meters (raw size: {raw_width:.4f}x{raw_height:.4f})")
 
     # Apply scale to all coordinates
-    lines = [((p1[0] * scale_factor, p1[1] * scale_factor),
-              (p2[0] * scale_factor, p2[1] * scale_factor)) for p1, p2 in lines]
+    segs *= scale_factor
     min_x *= scale_factor
     max_x *= scale_factor
     min_y *= scale_factor
@@ -276,35 +325,39 @@ def convert_dxf_to_svg(dxf_content: bytes) -> Dict:
 
     # No padding - preserve exact dimensions for accuracy
 
-    # Generate SVG with true scale dimensions
-    svg = [f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {width:.4f} {height:.4f}" width="{width:.4f}" height="{height:.4f}">']
+    # Generate SVG with true scale dimensions, directly as (ASCII) bytes
+    svg = bytearray(b'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 %.4f %.4f" width="%.4f" height="%.4f">\n'
+                    % (width, height, width, height))
     # Stroke width proportional to drawing size for visibility
     stroke_width = max(width, height) * 0.002
-    svg.append(f'<g stroke="#374151" stroke-width="{stroke_width:.4f}" fill="none">')
+    svg += b'<g stroke="#374151" stroke-width="%.4f" fill="none">\n' % stroke_width
 
-    for (x1, y1), (x2, y2) in lines:
-        # Transform: offset to origin, flip Y (preserve exact coordinates)
-        sx1 = x1 - min_x
-        sy1 = height - (y1 - min_y)
-        sx2 = x2 - min_x
-        sy2 = height - (y2 - min_y)
-        svg.append(f'<line x1="{sx1:.4f}" y1="{sy1:.4f}" x2="{sx2:.4f}" y2="{sy2:.4f}"/>')
+    # Transform: offset to origin, flip Y (preserve exact coordinates)
+    svg_segs = np.empty_like(segs)
+    svg_segs[:, 0::2] = xs - min_x
+    svg_segs[:, 1::2] = height - (ys - min_y)
 
-    svg.append('</g></svg>')
-    svg_str = '\n'.join(svg)
+    # All <line> elements in one %-format call instead of one f-string per segment
+    svg += b'\n'.join([_SVG_LINE_FMT] * len(svg_segs)) % tuple(svg_segs.ravel().tolist())
 
-    # Extract corners (endpoints only - simple and fast)
-    # Use higher precision rounding to preserve accuracy
-    corners_set: Set[Tuple[float, float]] = set()
-    for (x1, y1), (x2, y2) in lines:
-        # Transform to SVG coords with high precision
-        corners_set.add((round(x1 - min_x, 4), round(height - (y1 - min_y), 4)))
-        corners_set.add((round(x2 - min_x, 4), round(height - (y2 - min_y), 4)))
+    svg += b'\n</g></svg>'
 
-    corners = [{'x': x, 'y': y} for x, y in corners_set]
+    # Extract corners (endpoints only - simple and fast)
+    # Use higher precision rounding to preserve accuracy: snap endpoints (already in
+    # SVG coords) to a CORNER_SNAP grid and dedupe on one int64 cell key per point
+    pts = np.concatenate([svg_segs[:, 0:2], svg_segs[:, 2:4]], axis=0)
+    per_unit = 1.0 / CORNER_SNAP
+    cells = np.round(pts * per_unit).astype(np.int64)
+    origin = cells.min(axis=0)
+    cells -= origin
+    ny = int(cells[:, 1].max()) + 1
+    flat = np.unique(cells[:, 0] * ny + cells[:, 1])
+    cells = np.stack([flat // ny, flat % ny], axis=1) + origin
+
+    corners = [{'x': x, 'y': y} for x, y in (cells / per_unit).tolist()]
 
     # Encode SVG
-    svg_b64 = base64.b64encode(svg_str.encode()).decode()
+    svg_b64 = base64.b64encode(svg).decode('ascii')
     svg_url = f'data:image/svg+xml;base64,{svg_b64}'
 
     return {
@@ -312,6 +365,6 @@ def convert_dxf_to_svg(dxf_content: bytes) -> Dict:
         'corners': corners,
         'width': round(width, 4),
         'height': round(height, 4),
-        'lineCount': len(lines),
+        'lineCount': len(segs),
         'cornerCount': len(corners)
     }
@@ -23,9 +23,14 @@ import os
 import json
 import subprocess
 import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from pathlib import Path
 from typing import List, Dict, Any
 
+import numpy as np
+
 # Blender executable path - will try multiple versions
 BLENDER_PATHS = [
     r"C:\Program Files\Blender Foundation\Blender 5.0\blender.exe",
@@ -35,12 +40,10 @@ BLENDER_PATHS = [
     r"C:\Program Files\Blender Foundation\Blender 3.6\blender.exe",
 ]
 
+@lru_cache(maxsize=1)
 def find_blender():
-    """Find an available Blender installation."""
-    for path in BLENDER_PATHS:
-        if os.path.exists(path):
-            return path
-    return None
+    """Find an available Blender installation (looked up once per process)."""
+    return next((path for path in BLENDER_PATHS if os.path.exists(path)), None)
 
 # Marker colors for each view (matching the 3DBuilder add-on v6.5.0 expectations)
 # Side views use left/right markers for alignment:
@@ -67,6 +70,8 @@ VIEW_MARKERS = {
 # Shape type colors for the 3dBuilder add-on v6.5.0
 # Colors don't matter for v6.5.0 - naming is primary
 # But we use distinct colors for visual clarity in SVGs
+# (pure functions of a few small ints, so results are memoized)
+@lru_cache(maxsize=None)
 def get_on_color_for_index(color_index: int) -> tuple:
     """Generate a unique dark grey color for each 'on' group."""
     # Use dark greys that won't be confused with markers
@@ -76,6 +81,7 @@ def get_on_color_for_index(color_index: int) -> tuple:
     return (value, value, value)
 
 
+@lru_cache(maxsize=None)
 def get_off_color_for_index(color_index: int, sub_index: int) -> tuple:
     """
     Generate a unique reddish color for each 'off' (colorIndex, subIndex) pair.
@@ -95,6 +101,7 @@ def get_off_color_for_index(color_index: int, sub_index: int) -> tuple:
     return (r_value, gb_value, gb_value)
 
 
+@lru_cache(maxsize=None)
 def get_cut_color_for_index(color_index: int, sub_index: int) -> tuple:
     """
     Generate a unique purple color for each 'cut' (colorIndex, subIndex) pair.
@@ -110,6 +117,45 @@ def get_cut_color_for_index(color_index: int, sub_index: int) -> tuple:
     return (r_value, base_g, b_value)
 
 
+# shapeType -> (color_index, sub_index) -> (rgb, shape name)
+_SHAPE_STYLES = {
+    'on': lambda c, s: (get_on_color_for_index(c), f"on-{c}"),
+    'off': lambda c, s: (get_off_color_for_index(c, s), f"off-{c}-{s}"),
+    'cut': lambda c, s: (get_cut_color_for_index(c, s), f"cut-{c}-{s}"),
+}
+
+# SVG skeleton, formatted once per view (marker geometry scales with the canvas)
+_SVG_HEADER_TMPL = '\n'.join([
+    '<?xml version="1.0" encoding="UTF-8"?>',
+    '<svg xmlns="http://www.w3.org/2000/svg" width="{cs}mm" height="{cs}mm" viewBox="0 0 {cs} {cs}">',
+    '  <!-- View: {view_upper} - Real-world mm - Canvas {cs}mm -->',
+    '',
+    '  <!-- Background -->',
+    '  <rect width="{cs}" height="{cs}" fill="white"/>',
+    '',
+    '  <!-- Left Marker - {left_upper} -->',
+    '  <rect id="marker_{left_color}" x="0" y="{marker_m}" width="{marker_w}" height="{marker_len}" fill="rgb({left_rgb})"/>',
+    '',
+    '  <!-- Right Marker - {right_upper} -->',
+    '  <rect id="marker_{right_color}" x="{far_edge}" y="{marker_m}" width="{marker_w}" height="{marker_len}" fill="rgb({right_rgb})"/>',
+])
+
+_SVG_DEPTH_MARKERS_TMPL = '\n'.join([
+    '',
+    '  <!-- Top Marker (Front Edge) - {top_upper} -->',
+    '  <rect id="marker_{top_color}" x="{marker_m}" y="0" width="{marker_len}" height="{marker_w}" fill="rgb({top_rgb})"/>',
+    '',
+    '  <!-- Bottom Marker (Back Edge) - {bottom_upper} -->',
+    '  <rect id="marker_{bottom_color}" x="{marker_m}" y="{far_edge}" width="{marker_len}" height="{marker_w}" fill="rgb({bottom_rgb})"/>',
+])
+
+_SVG_SHAPE_TMPL = '  <polygon id="%s" points="%s" fill="rgb(%s,%s,%s)" stroke="rgb(%s,%s,%s)" stroke-width="%s"/>'
+
+
+def _rgb_str(rgb: tuple) -> str:
+    return f"{rgb[0]},{rgb[1]},{rgb[2]}"
+
+
 def generate_svg_for_view_unified(
     view: str,
     shapes: List[Dict],
@@ -138,39 +184,39 @@ def generate_svg_for_view_unified(
     markers = VIEW_MARKERS[view]
     left_color = markers['colors'][0]
     right_color = markers['colors'][1]
-    left_rgb = markers['rgb'][left_color]
-    right_rgb = markers['rgb'][right_color]
 
-    svg_parts = [
-        '<?xml version="1.0" encoding="UTF-8"?>',
-        f'<svg xmlns="http://www.w3.org/2000/svg" width="{cs}mm" height="{cs}mm" viewBox="0 0 {cs} {cs}">',
-        f'  <!-- View: {view.upper()} - Real-world mm - Canvas {cs}mm -->',
-        '',
-        '  <!-- Background -->',
-        f'  <rect width="{cs}" height="{cs}" fill="white"/>',
-        '',
-        f'  <!-- Left Marker - {left_color.upper()} -->',
-        f'  <rect id="marker_{left_color}" x="0" y="{marker_m}" width="{marker_w}" height="{cs - 2*marker_m}" fill="rgb({left_rgb[0]},{left_rgb[1]},{left_rgb[2]})"/>',
-        '',
-        f'  <!-- Right Marker - {right_color.upper()} -->',
-        f'  <rect id="marker_{right_color}" x="{cs - marker_w}" y="{marker_m}" width="{marker_w}" height="{cs - 2*marker_m}" fill="rgb({right_rgb[0]},{right_rgb[1]},{right_rgb[2]})"/>',
-    ]
+    svg_parts = [_SVG_HEADER_TMPL.format(
+        cs=cs,
+        view_upper=view.upper(),
+        marker_w=marker_w,
+        marker_m=marker_m,
+        marker_len=cs - 2*marker_m,
+        far_edge=cs - marker_w,
+        left_color=left_color,
+        left_upper=left_color.upper(),
+        left_rgb=_rgb_str(markers['rgb'][left_color]),
+        right_color=right_color,
+        right_upper=right_color.upper(),
+        right_rgb=_rgb_str(markers['rgb'][right_color]),
+    )]
 
     # For TOP view, add depth markers (top=front edge, bottom=back edge)
     if view == 'top' and 'depth_colors' in markers:
         top_color = markers['depth_colors'][0]  # purple = front edge
         bottom_color = markers['depth_colors'][1]  # orange = back edge
-        top_rgb = markers['depth_rgb'][top_color]
-        bottom_rgb = markers['depth_rgb'][bottom_color]
-
-        svg_parts.extend([
-            '',
-            f'  <!-- Top Marker (Front Edge) - {top_color.upper()} -->',
-            f'  <rect id="marker_{top_color}" x="{marker_m}" y="0" width="{cs - 2*marker_m}" height="{marker_w}" fill="rgb({top_rgb[0]},{top_rgb[1]},{top_rgb[2]})"/>',
-            '',
-            f'  <!-- Bottom Marker (Back Edge) - {bottom_color.upper()} -->',
-            f'  <rect id="marker_{bottom_color}" x="{marker_m}" y="{cs - marker_w}" width="{cs - 2*marker_m}" height="{marker_w}" fill="rgb({bottom_rgb[0]},{bottom_rgb[1]},{bottom_rgb[2]})"/>',
-        ])
+
+        svg_parts.append(_SVG_DEPTH_MARKERS_TMPL.format(
+            marker_w=marker_w,
+            marker_m=marker_m,
+            marker_len=cs - 2*marker_m,
+            far_edge=cs - marker_w,
+            top_color=top_color,
+            top_upper=top_color.upper(),
+            top_rgb=_rgb_str(markers['depth_rgb'][top_color]),
+            bottom_color=bottom_color,
+            bottom_upper=bottom_color.upper(),
+            bottom_rgb=_rgb_str(markers['depth_rgb'][bottom_color]),
+        ))
 
     svg_parts.extend([
         '',
@@ -178,6 +224,7 @@ def generate_svg_for_view_unified(
     ])
 
     # Add shapes with v6.5.0 naming convention
+    stroke_w = 2 * px2mm
     for idx, shape in enumerate(shapes):
         shape_type = shape.get('shapeType', 'on')
         color_index = shape.get('colorIndex', 1)
@@ -187,30 +234,34 @@ def generate_svg_for_view_unified(
         if len(points) < 3:
             continue
 
-        # Convert pixel coordinates to mm
-        points_str = ' '.join(f"{p['x'] * px2mm},{p['y'] * px2mm}" for p in points)
+        # Convert pixel coordinates to mm (one array multiply for all vertices)
+        pts_mm = np.array([(p['x'], p['y']) for p in points], dtype=np.float64) * px2mm
+        points_str = ' '.join('%r,%r' % (x, y) for x, y in pts_mm.tolist())
 
         # Determine color and name based on type
-        if shape_type == 'on':
-            rgb = get_on_color_for_index(color_index)
-            shape_name = f"on-{color_index}"
-        elif shape_type == 'off':
-            rgb = get_off_color_for_index(color_index, sub_index)
-            shape_name = f"off-{color_index}-{sub_index}"
-        elif shape_type == 'cut':
-            rgb = get_cut_color_for_index(color_index, sub_index)
-            shape_name = f"cut-{color_index}-{sub_index}"
+        style = _SHAPE_STYLES.get(shape_type)
+        if style is not None:
+            rgb, shape_name = style(color_index, sub_index)
         else:
             rgb = (0, 0, 0)
             shape_name = f"unknown-{idx}"
 
         shape_id = f"{shape_name}-{idx}"
-        svg_parts.append(f'  <polygon id="{shape_id}" points="{points_str}" fill="rgb({rgb[0]},{rgb[1]},{rgb[2]})" stroke="rgb({rgb[0]},{rgb[1]},{rgb[2]})" stroke-width="{2 * px2mm}"/>')
+        svg_parts.append(_SVG_SHAPE_TMPL % (shape_id, points_str, *rgb, *rgb, stroke_w))
 
     svg_parts.extend(['', '</svg>'])
     return '\n'.join(svg_parts)
 
 
+def write_view_svg(view: str, shapes: List[Dict], project_dir: Path, canvas_size_mm: float) -> Path:
+    """Generate the SVG for one view and write it to <project_dir>/<view>.svg."""
+    svg_content = generate_svg_for_view_unified(view, shapes, canvas_size_mm=canvas_size_mm)
+    svg_path = project_dir / f"{view}.svg"
+    with open(svg_path, 'w', encoding='utf-8') as f:
+        f.write(svg_content)
+    return svg_path
+
+
 def build_elemente_3d(
     shapes_data: Dict[str, List[Dict]],
     canvas_size_mm: float = 4000.0,
@@ -271,44 +322,36 @@ def build_elemente_3d(
     print(f"Project directory: {project_dir}")
 
     try:
-        # Count shapes by type for logging
-        on_count = 0
-        off_count = 0
-        cut_count = 0
-        for view, shapes in shapes_data.items():
-            for shape in shapes:
-                stype = shape.get('shapeType', 'on')
-                if stype == 'on':
-                    on_count += 1
-                elif stype == 'off':
-                    off_count += 1
-                elif stype == 'cut':
-                    cut_count += 1
-
-        print(f"Total shapes: {on_count} 'on', {off_count} 'off', {cut_count} 'cut'")
-
-        if on_count == 0:
+        # Count shapes by type for logging (one pass per view)
+        view_counts = {
+            view: Counter(s.get('shapeType', 'on') for s in shapes)
+            for view, shapes in shapes_data.items()
+        }
+        totals = sum(view_counts.values(), Counter())
+
+        print(f"Total shapes: {totals['on']} 'on', {totals['off']} 'off', {totals['cut']} 'cut'")
+
+        if totals['on'] == 0:
             return {
                 "success": False,
                 "error": "No 'on' shapes found",
                 "logs": "No shapes with shapeType='on' to process"
             }
 
-        # Generate SVGs for all views (including top view)
+        # Generate SVGs for all views (including top view), written concurrently
+        views = ['front', 'right', 'left', 'back', 'top']
+        with ThreadPoolExecutor(max_workers=len(views)) as ex:
+            list(ex.map(
+                lambda v: write_view_svg(v, shapes_data.get(v, []), project_dir, canvas_size_mm),
+                views,
+            ))
+
         views_with_on = 0
-        for view in ['front', 'right', 'left', 'back', 'top']:
-            all_shapes = shapes_data.get(view, [])
-            svg_content = generate_svg_for_view_unified(view, all_shapes, canvas_size_mm=canvas_size_mm)
-            svg_path = project_dir / f"{view}.svg"
-            with open(svg_path, 'w', encoding='utf-8') as f:
-                f.write(svg_content)
-
-            on_in_view = sum(1 for s in all_shapes if s.get('shapeType') == 'on')
-            off_in_view = sum(1 for s in all_shapes if s.get('shapeType') == 'off')
-            cut_in_view = sum(1 for s in all_shapes if s.get('shapeType') == 'cut')
-            if on_in_view > 0:
+        for view in views:
+            counts = view_counts.get(view, Counter())
+            if counts['on'] > 0:
                 views_with_on += 1
-            print(f"  {view}.svg: {on_in_view} on, {off_in_view} off, {cut_in_view} cut")
+            print(f"  {view}.svg: {counts['on']} on, {counts['off']} off, {counts['cut']} cut")
 
         if views_with_on < 2:
             return {
@@ -335,20 +378,25 @@ def build_elemente_3d(
         ]
 
         print(f"Running Blender...")
-        proc = subprocess.run(
-            cmd,
-            cwd=str(project_dir),
-            capture_output=True,
-            text=True,
-            errors="replace",
-            timeout=120
-        )
-
-        logs = f"=== STDOUT ===\n{proc.stdout}\n\n=== STDERR ===\n{proc.stderr}"
-
+        # Blender writes stdout+stderr straight into the log file (nothing buffered
+        # in this process while it runs; the file can be tailed for progress)
         log_path = project_dir / "blender_output.log"
-        with open(log_path, 'w', encoding='utf-8') as f:
-            f.write(logs)
+        with open(log_path, 'wb') as log_file:
+            proc = subprocess.Popen(
+                cmd,
+                cwd=str(project_dir),
+                stdout=log_file,
+                stderr=subprocess.STDOUT,
+            )
+            try:
+                proc.wait(timeout=120)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+                proc.wait()
+                raise
+
+        with open(log_path, 'r', encoding='utf-8', errors='replace') as f:
+            logs = f.read()
 
         if output_glb.exists() and output_glb.stat().st_size > 0:
             with open(output_glb, 'rb') as f:
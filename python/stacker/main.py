@@ -1,16 +1,103 @@
 from fastapi import FastAPI, UploadFile, Form, File, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, Response
+from fastapi.responses import FileResponse, Response, JSONResponse, ORJSONResponse
+from starlette.background import BackgroundTask
+from starlette.concurrency import run_in_threadpool
 from typing import List, Optional, Dict, Any
 from pydantic import BaseModel
 import json
 import tempfile
 import os
+import shutil
+import errno
 import traceback
-import base64
+import uuid
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+try:
+    import pybase64 as base64
+except ImportError:
+    import base64
 from elemente_builder import build_elemente_3d
 
-app = FastAPI()
+# orjson serializes the large base64 payloads much faster than stdlib json
+app = FastAPI(default_response_class=ORJSONResponse if orjson else JSONResponse)
+
+# Chunk size for streaming uploads to disk
+UPLOAD_CHUNK = 1 << 20
+
+# Keep request temp files on tmpfs when available. Files there live in RAM and container
+# tmpfs is often small, so STACKER_TMP_DIR overrides it ("" = default tempdir) and a full
+# tmpfs falls back to the default tempdir.
+TMP_DIR = os.environ.get("STACKER_TMP_DIR")
+if TMP_DIR is None:
+    TMP_DIR = "/dev/shm" if os.path.isdir("/dev/shm") and os.access("/dev/shm", os.W_OK) else None
+TMP_DIR = TMP_DIR or None
+TMP_DIRS = (TMP_DIR, None) if TMP_DIR else (None,)
+
+
+def temp_file(suffix, tmp_dir=TMP_DIR):
+    return tempfile.NamedTemporaryFile(delete=False, suffix=suffix, mode='wb', dir=tmp_dir)
+
+
+def _retry_elsewhere(e, tmp_dir):
+    return isinstance(e, OSError) and e.errno == errno.ENOSPC and tmp_dir is not None
+
+
+def spool_upload(upload, suffix):
+    """Copy an upload to a temp file; returns (path, size). Blocking, run it in the threadpool."""
+    for tmp_dir in TMP_DIRS:
+        tmp = temp_file(suffix, tmp_dir)
+        try:
+            with tmp:
+                shutil.copyfileobj(upload.file, tmp, UPLOAD_CHUNK)
+                return tmp.name, tmp.tell()
+        except BaseException as e:
+            os.unlink(tmp.name)
+            if not _retry_elsewhere(e, tmp_dir):
+                raise
+            upload.file.seek(0)
+
+
+async def write_temp_output(fn, *args):
+    """Run fn(*args, output_path) in the threadpool on a fresh temp .glb; returns the path.
+    The file is removed on failure, since only a sent response cleans it up."""
+    for tmp_dir in TMP_DIRS:
+        with temp_file(".glb", tmp_dir) as out:
+            output_path = out.name
+        try:
+            await run_in_threadpool(fn, *args, output_path)
+            return output_path
+        except BaseException as e:
+            os.unlink(output_path)
+            if not _retry_elsewhere(e, tmp_dir):
+                raise
+
+
+def file_response(path, filename):
+    # Delete the temp output once it has been sent
+    return FileResponse(path, filename=filename, media_type="model/gltf-binary",
+                        background=BackgroundTask(os.unlink, path))
+
+
+def multipart_response(parts):
+    """Build a multipart/mixed response from (name, media_type, bytes) parts."""
+    boundary = uuid.uuid4().hex
+    chunks = []
+    for name, media_type, data in parts:
+        chunks.append(
+            f"--{boundary}\r\nContent-Type: {media_type}\r\n"
+            f"Content-Disposition: attachment; name=\"{name}\"\r\n\r\n".encode('ascii'))
+        chunks.append(data)
+        chunks.append(b"\r\n")
+    chunks.append(f"--{boundary}--\r\n".encode('ascii'))
+    return Response(b"".join(chunks), media_type=f"multipart/mixed; boundary={boundary}")
 
 
 # Pydantic models for Elemente Builder
@@ -48,7 +135,7 @@ async def merge_glb(files: List[UploadFile] = File(...), transforms: str = Form(
     temp_files = []
     try:
         print(f"Received {len(files)} files for GLB merging")
-        transform_list = json.loads(transforms)
+        transform_list = orjson.loads(transforms) if orjson else json.loads(transforms)
         print(f"Transforms: {transform_list}")
 
         # We'll use pygltflib to merge GLB files
@@ -57,27 +144,20 @@ async def merge_glb(files: List[UploadFile] = File(...), transforms: str = Form(
         except ImportError:
             # Fallback: just return the first file if merge not available
             if len(files) > 0:
-                content = await files[0].read()
-                tmp = tempfile.NamedTemporaryFile(delete=False, suffix=".glb", mode='wb')
-                tmp.write(content)
-                tmp.close()
-                return FileResponse(tmp.name, filename="merged_building.glb", media_type="model/gltf-binary")
+                path, _ = await run_in_threadpool(spool_upload, files[0], ".glb")
+                return file_response(path, "merged_building.glb")
             raise HTTPException(status_code=500, detail="No merge library available and no files provided")
 
         floor_data = []
         for i, file in enumerate(files):
-            content = await file.read()
-            print(f"File {i}: {file.filename}, size: {len(content)} bytes")
-
-            # Write content to a temp file
-            temp_glb = tempfile.NamedTemporaryFile(delete=False, suffix=".glb", mode='wb')
-            temp_glb.write(content)
-            temp_glb.close()
-            temp_files.append(temp_glb.name)
+            # Stream the upload to a temp file off the event loop
+            path, size = await run_in_threadpool(spool_upload, file, ".glb")
+            temp_files.append(path)
+            print(f"File {i}: {file.filename}, size: {size} bytes")
 
             props = transform_list[i]
             floor_data.append({
-                'file_path': temp_glb.name,
+                'file_path': path,
                 'tx': props.get('x') or 0,
                 'ty': props.get('y') or 0,  # elevation
                 'tz': props.get('z') or 0,
@@ -85,11 +165,10 @@ async def merge_glb(files: List[UploadFile] = File(...), transforms: str = Form(
             })
 
         print("Starting GLB merge...")
-        output_path = tempfile.NamedTemporaryFile(delete=False, suffix=".glb").name
-        merge_glb_files(floor_data, output_path)
+        output_path = await write_temp_output(merge_glb_files, floor_data)
         print(f"GLB merge complete, output: {output_path}")
 
-        return FileResponse(output_path, filename="merged_building.glb", media_type="model/gltf-binary")
+        return file_response(output_path, "merged_building.glb")
 
     except Exception as e:
         print(f"Error during GLB merge: {str(e)}")
@@ -98,9 +177,9 @@ async def merge_glb(files: List[UploadFile] = File(...), transforms: str = Form(
 
     finally:
         # Clean up temp files
-        for temp_file in temp_files:
+        for temp_path in temp_files:
             try:
-                os.unlink(temp_file)
+                os.unlink(temp_path)
             except:
                 pass
 
@@ -112,22 +191,18 @@ async def convert_ifc_to_glb(file: UploadFile = File(...)):
     """
     try:
         print(f"Converting IFC to GLB: {file.filename}")
-        content = await file.read()
 
-        # Write to temp file
-        temp_ifc = tempfile.NamedTemporaryFile(delete=False, suffix=".ifc", mode='wb')
-        temp_ifc.write(content)
-        temp_ifc.close()
+        # Stream the upload to a temp file off the event loop
+        ifc_path, _ = await run_in_threadpool(spool_upload, file, ".ifc")
 
         try:
             from convert_ifc import convert_ifc_to_glb as do_convert
-            output_path = tempfile.NamedTemporaryFile(delete=False, suffix=".glb").name
-            do_convert(temp_ifc.name, output_path)
-            return FileResponse(output_path, filename="converted.glb", media_type="model/gltf-binary")
+            output_path = await write_temp_output(do_convert, ifc_path)
+            return file_response(output_path, "converted.glb")
         except ImportError:
             raise HTTPException(status_code=500, detail="IFC to GLB conversion not available")
         finally:
-            os.unlink(temp_ifc.name)
+            os.unlink(ifc_path)
 
     except Exception as e:
         print(f"Error during IFC to GLB conversion: {str(e)}")
@@ -158,12 +233,14 @@ async def convert_dxf(file: UploadFile = File(...)):
 
 
 @app.post("/api/elemente-build")
-async def elemente_build(request: ElementeBuildRequest):
+async def elemente_build(request: ElementeBuildRequest, response_format: str = Query("json", alias="format")):
     """
     Build a 3D model from Elemente shapes using the 3D Builder approach.
     Takes shapes from 5 views (front, right, left, back, top) and creates an intersection mesh.
     The 'top' view is for floor plan drawing and doesn't intersect with side views.
-    Returns the GLB file as base64.
+    Returns the GLB file as base64, or with ?format=multipart as raw binary parts
+    (meta JSON, glb, ifc) in a multipart/mixed body, or with ?format=msgpack as a
+    msgpack map with raw glb/ifc bytes (falls back to JSON if msgpack is not installed).
     """
     try:
         print(f"Elemente Build: Received {len(request.shapes)} shapes")
@@ -211,14 +288,33 @@ async def elemente_build(request: ElementeBuildRequest):
         # Run the builder
         result = build_elemente_3d(shapes_by_view, request.canvasSizeMM)
 
+        if result.get('success') and result.get('glb_data') and response_format == "multipart":
+            # Send the binaries as-is, no base64 inflation
+            meta = {"success": True, "logs": result.get('logs', '')}
+            meta = orjson.dumps(meta) if orjson else json.dumps(meta).encode('utf-8')
+            parts = [("meta", "application/json", meta),
+                     ("glb", "model/gltf-binary", result['glb_data'])]
+            if result.get('ifc_data'):
+                parts.append(("ifc", "application/x-step", result['ifc_data']))
+            return multipart_response(parts)
+
+        if result.get('success') and result.get('glb_data') and response_format == "msgpack" and msgpack:
+            # msgpack carries the bytes raw, no base64 pass at all
+            return Response(msgpack.packb({
+                "success": True,
+                "glb": result['glb_data'],
+                "ifc": result.get('ifc_data'),
+                "logs": result.get('logs', '')
+            }), media_type="application/msgpack")
+
         if result.get('success') and result.get('glb_data'):
             # Convert GLB to base64 for JSON response
-            glb_base64 = base64.b64encode(result['glb_data']).decode('utf-8')
+            glb_base64 = base64.b64encode(result['glb_data']).decode('ascii')
 
             # Convert IFC to base64 if available
             ifc_base64 = None
             if result.get('ifc_data'):
-                ifc_base64 = base64.b64encode(result['ifc_data']).decode('utf-8')
+                ifc_base64 = base64.b64encode(result['ifc_data']).decode('ascii')
 
             return {
                 "success": True,
@@ -3,18 +3,56 @@ import ifcopenshell.api
 import math
 import numpy as np
 import uuid
-import tempfile
 import os
 import shutil
+from concurrent.futures import ProcessPoolExecutor
+
+# Product classes copied into the merged building (subtypes included)
+COPY_PRODUCT_TYPES = (
+    "IfcWall", "IfcWallStandardCase", "IfcSlab", "IfcBeam", "IfcColumn",
+    "IfcDoor", "IfcWindow", "IfcCurtainWall", "IfcStair", "IfcRailing",
+    "IfcRoof", "IfcCovering", "IfcFurniture", "IfcBuildingElementProxy",
+    "IfcPlate", "IfcMember", "IfcFooting", "IfcFlowTerminal",
+    "IfcOpeningElement"
+)
 
 def create_guid():
     return ifcopenshell.guid.compress(uuid.uuid4().hex)
 
 
+def _open_floor(floor_data):
+    """Open a floor's source IFC from its path, or parse uploaded bytes directly without a temp file."""
+    if 'file_path' in floor_data:
+        return ifcopenshell.open(floor_data['file_path'])
+    # STEP is ASCII; utf-8 also keeps names from exporters that write raw UTF-8
+    return ifcopenshell.file.from_string(floor_data['file_bytes'].decode('utf-8', errors='replace'))
+
+
+def _extract_floor_products(floor_data):
+    """
+    Worker: open one floor's source IFC and return (ifc_class, name) for each product to copy.
+    """
+    src = _open_floor(floor_data)
+
+    # Get products from source: one walk over IfcProduct, decide once per class
+    # (is_a(t) also matches subtypes, same as by_type(t) did)
+    products = []
+    keep = {}
+    for p in src.by_type("IfcProduct"):
+        ifc_class = p.is_a()
+        ok = keep.get(ifc_class)
+        if ok is None:
+            ok = keep[ifc_class] = any(p.is_a(t) for t in COPY_PRODUCT_TYPES)
+        if ok:
+            products.append((ifc_class, p.Name))
+
+    return products
+
+
 def merge_ifc_files(floor_data_list):
     """
     Merge multiple IFC floor files into a single building.
-    Uses a sequential approach: process one floor at a time in separate processes.
+    Source floors are parsed in parallel worker processes; the merge itself is sequential.
     """
     print(f"Merging {len(floor_data_list)} floors...")
 
@@ -23,16 +61,7 @@ def merge_ifc_files(floor_data_list):
 
     # Single floor - just return with adjusted elevation
     if len(floor_data_list) == 1:
-        floor_data = floor_data_list[0]
-        if 'file_path' in floor_data:
-            return ifcopenshell.open(floor_data['file_path'])
-        else:
-            tmp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".ifc", mode='wb')
-            tmp_file.write(floor_data['file_bytes'])
-            tmp_file.close()
-            result = ifcopenshell.open(tmp_file.name)
-            os.unlink(tmp_file.name)
-            return result
+        return _open_floor(floor_data_list[0])
 
     # Multiple floors - create a combined file structure
     # We'll create a new IFC with the spatial structure and reference floors
@@ -56,6 +85,25 @@ def merge_ifc_files(floor_data_list):
     ifcopenshell.api.run("aggregate.assign_object", f, relating_object=project, products=[site])
     ifcopenshell.api.run("aggregate.assign_object", f, relating_object=site, products=[building])
 
+    # Identical sources (stacked copies of one plan) are parsed only once,
+    # keyed on path+mtime or on the uploaded bytes themselves
+    jobs = {}
+    keys = []
+    for floor_data in floor_data_list:
+        if 'file_path' in floor_data:
+            src_path = floor_data['file_path']
+            key = (src_path, os.path.getmtime(src_path))
+        else:
+            key = floor_data['file_bytes']
+        jobs.setdefault(key, floor_data)
+        keys.append(key)
+
+    # Parse the source floors in parallel; only (class, name) pairs come back
+    workers = min(len(jobs), os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=workers) as ex:
+        parsed = dict(zip(jobs, ex.map(_extract_floor_products, jobs.values())))
+    floor_products = [parsed[key] for key in keys]
+
     # Process each floor
     for i, floor_data in enumerate(floor_data_list):
         print(f"Processing floor {i}...")
@@ -73,82 +121,50 @@ def merge_ifc_files(floor_data_list):
 
         ifcopenshell.api.run("aggregate.assign_object", f, relating_object=building, products=[storey])
 
-        # Set storey placement with transformation
-        T = np.eye(4)
-        T[0, 3] = off_x
-        T[1, 3] = off_y
-        T[2, 3] = elevation
-
-        if rot_z != 0:
-            c, s = math.cos(rot_z), math.sin(rot_z)
-            R = np.eye(4)
-            R[0, 0] = c
-            R[0, 1] = -s
-            R[1, 0] = s
-            R[1, 1] = c
-            T = np.dot(T, R)
+        # Set storey placement with transformation (translation * Z-rotation)
+        c, s = (math.cos(rot_z), math.sin(rot_z)) if rot_z != 0 else (1.0, 0.0)
+        T = np.array([[c, -s, 0.0, off_x],
+                      [s, c, 0.0, off_y],
+                      [0.0, 0.0, 1.0, elevation],
+                      [0.0, 0.0, 0.0, 1.0]], dtype=np.float64)
 
         ifcopenshell.api.run("geometry.edit_object_placement", f, product=storey, matrix=T)
 
-        # Load source file
-        if 'file_path' in floor_data:
-            src_path = floor_data['file_path']
-            src = ifcopenshell.open(src_path)
-        else:
-            tmp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".ifc", mode='wb')
-            tmp_file.write(floor_data['file_bytes'])
-            tmp_file.close()
-            src_path = tmp_file.name
-            src = ifcopenshell.open(src_path)
-
-        # Get products from source
-        product_types = [
-            "IfcWall", "IfcWallStandardCase", "IfcSlab", "IfcBeam", "IfcColumn",
-            "IfcDoor", "IfcWindow", "IfcCurtainWall", "IfcStair", "IfcRailing",
-            "IfcRoof", "IfcCovering", "IfcFurniture", "IfcBuildingElementProxy",
-            "IfcPlate", "IfcMember", "IfcFooting", "IfcFlowTerminal",
-            "IfcOpeningElement"
-        ]
-
-        products = []
-        for ptype in product_types:
-            try:
-                products.extend(src.by_type(ptype))
-            except:
-                pass
-
+        products = floor_products[i]
         print(f"  Found {len(products)} products in floor {i}")
 
         # Copy products to the merged file
-        copied_count = 0
-        for product in products:
+        new_elements = []
+        for ifc_class, name in products:
             try:
                 # Create a new entity of the same type
-                new_element = ifcopenshell.api.run("root.create_entity", f,
-                    ifc_class=product.is_a(),
-                    name=product.Name or f"{product.is_a()}_{i}_{copied_count}")
-
-                # Assign to storey
-                ifcopenshell.api.run("spatial.assign_container", f,
-                    relating_structure=storey,
-                    products=[new_element])
-
-                copied_count += 1
+                new_elements.append(f.create_entity(ifc_class,
+                    GlobalId=create_guid(),
+                    Name=name or f"{ifc_class}_{i}_{len(new_elements)}"))
             except Exception as e:
                 # Skip problematic elements
                 continue
 
-        print(f"  Copied {copied_count} products to floor {i}")
-
-        # Clean up temp file if we created one
-        if 'file_path' not in floor_data:
-            try:
-                os.unlink(src_path)
-            except:
-                pass
+        # Assign all copies to the storey in one call
+        copied_count = 0
+        try:
+            if new_elements:
+                ifcopenshell.api.run("spatial.assign_container", f,
+                    relating_structure=storey,
+                    products=new_elements)
+            copied_count = len(new_elements)
+        except Exception:
+            # Fall back to one at a time so a single bad element is skipped
+            for new_element in new_elements:
+                try:
+                    ifcopenshell.api.run("spatial.assign_container", f,
+                        relating_structure=storey,
+                        products=[new_element])
+                    copied_count += 1
+                except Exception:
+                    continue
 
-        # Force close source to free memory
-        del src
+        print(f"  Copied {copied_count} products to floor {i}")
 
     print(f"Merge complete! Created {len(f.by_type('IfcBuildingStorey'))} storeys")
     return f
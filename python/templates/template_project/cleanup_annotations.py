@@ -8,6 +8,7 @@
 # To revert: the original svg2ifc.py is unchanged, just don't run this script
 # -------------------------------------------------------------------------------------------------
 
+import mmap
 import os
 import re
 import shutil
@@ -18,6 +19,14 @@ WORK_DIR = os.getcwd()
 IFC_PATH = os.path.join(WORK_DIR, "generated.ifc")
 BACKUP_PATH = os.path.join(WORK_DIR, "generated_with_annotations.ifc")
 
+# Set CLEANUP_VERBOSE=1 to log every removed entity line
+VERBOSE = os.environ.get("CLEANUP_VERBOSE") == "1"
+
+# Static patterns, compiled once (bytes: matched against the mmapped file)
+ANNOTATION_RE = re.compile(rb'^[ \t]*#(\d+)\s*=\s*IFCANNOTATION\s*\(', re.IGNORECASE | re.MULTILINE)
+REF_RE = re.compile(rb'#(\d+)')
+ENTITY_RE = re.compile(r'^\s*#(\d+)\s*=')
+
 def log(msg):
     print(f"[CLEANUP] {msg}")
 
@@ -30,23 +39,32 @@ def cleanup_annotations():
         log(f"No IFC file found at {IFC_PATH}")
         return False
 
-    # Create backup
-    shutil.copy2(IFC_PATH, BACKUP_PATH)
-    log(f"Created backup: {BACKUP_PATH}")
-
-    with open(IFC_PATH, 'r', encoding='utf-8') as f:
-        content = f.read()
-
-    lines = content.split('\n')
-
-    # Find all IfcAnnotation entity IDs
+    # Pass 1: find all IfcAnnotation entity IDs and the IDs they reference.
+    # Scans the memory-mapped bytes directly, no UTF-8 decode of the whole file.
     annotation_ids = set()
-    annotation_pattern = re.compile(r'^#(\d+)\s*=\s*IFCANNOTATION\s*\(', re.IGNORECASE)
-
-    for line in lines:
-        match = annotation_pattern.match(line.strip())
-        if match:
-            annotation_ids.add(match.group(1))
+    related_ids = set()
+    if os.path.getsize(IFC_PATH):
+        with open(IFC_PATH, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for match in ANNOTATION_RE.finditer(mm):
+                annotation_ids.add(match.group(1).decode('ascii'))
+                eol = mm.find(b'\n', match.end())
+                for ref in REF_RE.findall(mm, match.end(), eol if eol != -1 else len(mm)):
+                    related_ids.add(ref.decode('ascii'))
+
+    # Create backup. The cleaned file is swapped in with os.replace (new inode), so when
+    # there is something to clean a hardlink keeps the original bytes without copying them.
+    if os.path.lexists(BACKUP_PATH):
+        os.unlink(BACKUP_PATH)
+    linked = False
+    if annotation_ids:
+        try:
+            os.link(IFC_PATH, BACKUP_PATH)
+            linked = True
+        except OSError:
+            pass
+    if not linked:
+        shutil.copy2(IFC_PATH, BACKUP_PATH)
+    log(f"Created backup: {BACKUP_PATH}")
 
     if not annotation_ids:
         log("No IfcAnnotation entities found - nothing to clean")
@@ -54,54 +72,40 @@ def cleanup_annotations():
 
     log(f"Found {len(annotation_ids)} IfcAnnotation entities to remove: {annotation_ids}")
 
-    # Find all related entities (shape representations, placement, etc.)
-    # We'll collect IDs that reference the annotations
-    related_ids = set()
-
-    for anno_id in annotation_ids:
-        # Find the IFCANNOTATION line to get its references
-        anno_pattern = re.compile(rf'^#({anno_id})\s*=\s*IFCANNOTATION\s*\([^)]*\)', re.IGNORECASE)
-        for line in lines:
-            if anno_pattern.match(line.strip()):
-                # Extract all #ID references from this line
-                refs = re.findall(r'#(\d+)', line)
-                related_ids.update(refs)
-
     # IDs to remove (annotations + directly referenced geometry)
     # Be conservative - only remove the annotation entities themselves
     ids_to_remove = annotation_ids
 
     log(f"Removing {len(ids_to_remove)} entities")
 
-    # Filter out lines that define these entities
-    new_lines = []
-    removed_count = 0
-
-    for line in lines:
-        # Check if this line defines an entity we want to remove
-        entity_match = re.match(r'^#(\d+)\s*=', line.strip())
-        if entity_match and entity_match.group(1) in ids_to_remove:
-            removed_count += 1
-            log(f"Removed: {line.strip()[:80]}...")
-            continue
-        new_lines.append(line)
-
     # Also remove references to removed entities from IFCRELAGGREGATES and IFCRELCONTAINEDINSPATIALSTRUCTURE
-    # This prevents dangling references
-    final_lines = []
-    for line in new_lines:
-        modified_line = line
-        for anno_id in annotation_ids:
-            # Remove references like ,#123, or (#123, or ,#123) from aggregate lists
-            modified_line = re.sub(rf',\s*#{anno_id}\b', '', modified_line)
-            modified_line = re.sub(rf'#{anno_id}\s*,', '', modified_line)
-            # Handle case where it's the only item: (#123) -> ()
-            modified_line = re.sub(rf'\(\s*#{anno_id}\s*\)', '()', modified_line)
-        final_lines.append(modified_line)
-
-    # Write the cleaned IFC
-    with open(IFC_PATH, 'w', encoding='utf-8') as f:
-        f.write('\n'.join(final_lines))
+    # This prevents dangling references. One alternation covers all annotation IDs.
+    # Single regex: the only item (#123) -> (), otherwise drop ,#123 or #123, from the list
+    ids = '|'.join(sorted(annotation_ids))
+    ref_strip = re.compile(rf'\(\s*#(?:{ids})\s*\)|,\s*#(?:{ids})\b|#(?:{ids})\s*,')
+    ref_repl = lambda m: '()' if m.group(0)[0] == '(' else ''
+
+    # Pass 2: stream surviving lines into a temp file, then swap it in
+    removed_count = 0
+    tmp_path = IFC_PATH + ".tmp"
+
+    with open(IFC_PATH, 'r', encoding='utf-8') as fin, open(tmp_path, 'w', encoding='utf-8') as fout:
+        for line in fin:
+            # Skip lines that define an entity we want to remove
+            entity_match = ENTITY_RE.match(line)
+            if entity_match and entity_match.group(1) in ids_to_remove:
+                removed_count += 1
+                if VERBOSE:
+                    log(f"Removed: {line.strip()[:80]}...")
+                continue
+            if '#' in line:
+                # Repeat until stable: removing one item can leave another as the only one
+                line, n = ref_strip.subn(ref_repl, line)
+                while n:
+                    line, n = ref_strip.subn(ref_repl, line)
+            fout.write(line)
+
+    os.replace(tmp_path, IFC_PATH)
 
     log(f"Cleaned IFC written to {IFC_PATH}")
     log(f"Removed {removed_count} annotation entities")
@@ -26,12 +26,24 @@
 #    - gray filled rects for doors (id like d1-DOUBLE_SWING-1.8-2.10)
 # -------------------------------------------------------------------------------------------------
 
-import os, re, math, time, glob, traceback, subprocess, shutil, base64, urllib.parse
+import os, re, math, time, traceback, subprocess, shutil, base64, mmap, urllib.parse, threading
 import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 
 import bpy
 import numpy as np
 
+try:
+    from scipy.spatial import cKDTree  # optional: spatial index for host-wall lookup
+except ImportError:
+    cKDTree = None
+
+try:
+    from lxml import etree as LET  # optional: faster streaming parse of plan.svg
+except ImportError:
+    LET = None
+
 # --- Bonsai / IfcOpenShell ---
 try:
     from bonsai.bim.ifc import IfcStore
@@ -80,6 +92,12 @@ CURVE_SEGMENTS = 32
 # PDF conversion via Inkscape
 CONVERT_SVG_TO_PDF = True
 
+# Sheets per Inkscape process when batching PDF export (keeps the command line short)
+INKSCAPE_BATCH = 25
+
+# Prepare exported SVGs (fix-up, embed, DXF) on a thread pool, one sheet per task
+PARALLEL_EXPORT = True
+
 # Sheet hints (used only to detect sheet/layout exports)
 SHEET_HINT = "A01"
 SHEET_HINT_2 = "untitled"
@@ -93,16 +111,45 @@ BG_ORIGIN_EPS = 10.0
 # =========================
 # LOGGING
 # =========================
+# Export workers buffer their lines here so each sheet's log stays contiguous
+_LOG_BUF = threading.local()
+
 def log(msg: str):
     s = f"[{time.strftime('%H:%M:%S')}] {msg}"
-    print(s)
-    try:
-        with open(LOG_PATH, "a", encoding="utf-8") as f:
-            f.write(s + "\n")
-    except:
-        pass
+    buf = getattr(_LOG_BUF, "lines", None)
+    if buf is not None:
+        buf.append(s)
+        return
+    _emit_log_lines([s])
+
+# Lines printed but not yet in LOG_PATH; appended in blocks instead of an open/write/close per line
+LOG_FLUSH_LINES = 200
+_LOG_PENDING = []
+_LOG_LOCK = threading.Lock()
+
+def _emit_log_lines(lines):
+    for s in lines:
+        print(s)
+    with _LOG_LOCK:
+        _LOG_PENDING.extend(lines)
+        full = len(_LOG_PENDING) >= LOG_FLUSH_LINES
+    if full:
+        flush_log()
+
+def flush_log():
+    with _LOG_LOCK:
+        if not _LOG_PENDING:
+            return
+        try:
+            with open(LOG_PATH, "a", encoding="utf-8") as f:
+                f.write("".join(s + "\n" for s in _LOG_PENDING))
+        except:
+            pass
+        _LOG_PENDING.clear()
 
 def reset_log():
+    with _LOG_LOCK:
+        _LOG_PENDING.clear()
     try:
         with open(LOG_PATH, "w", encoding="utf-8") as f:
             f.write("")
@@ -164,18 +211,46 @@ def ensure_object_mode():
 # =========================
 # IFC HELPERS
 # =========================
+_IFC_ACCESSOR = None
+
 def get_ifc():
-    ifc = None
-    if hasattr(IfcStore, "get_file"):
-        ifc = IfcStore.get_file()
-    elif hasattr(IfcStore, "get"):
-        ifc = IfcStore.get()
-    else:
-        ifc = getattr(IfcStore, "file", None)
+    global _IFC_ACCESSOR
+    if _IFC_ACCESSOR is None:
+        # Resolve which IfcStore API this Bonsai version has, once
+        if hasattr(IfcStore, "get_file"):
+            _IFC_ACCESSOR = IfcStore.get_file
+        elif hasattr(IfcStore, "get"):
+            _IFC_ACCESSOR = IfcStore.get
+        else:
+            _IFC_ACCESSOR = lambda: getattr(IfcStore, "file", None)
+    ifc = _IFC_ACCESSOR()
     if ifc is None:
         raise RuntimeError("No IFC loaded. Open your prepared template .blend with Bonsai project loaded.")
     return ifc
 
+_IFC_PATH_PROPS = None
+
+def _ifc_path_props(scene):
+    """(holder, prop) pairs of scene property groups holding an IFC path; discovered once."""
+    global _IFC_PATH_PROPS
+    if _IFC_PATH_PROPS is None:
+        found = []
+        # Only registered pointer props (Bonsai's BIM*Properties groups) can hold such strings
+        for holder in scene.bl_rna.properties:
+            if holder.type != 'POINTER':
+                continue
+            obj = getattr(scene, holder.identifier, None)
+            if obj is None or not hasattr(obj, "bl_rna"):
+                continue
+            for prop in obj.bl_rna.properties:
+                if prop.type != 'STRING':
+                    continue
+                pid = prop.identifier.lower()
+                if ("ifc" in pid) and ("file" in pid or "path" in pid) and ("bcf" not in pid):
+                    found.append((holder.identifier, prop.identifier))
+        _IFC_PATH_PROPS = tuple(found)
+    return _IFC_PATH_PROPS
+
 def try_set_bonsai_ifc_path(path_abs):
     p = os.path.abspath(path_abs).replace("\\", "/")
     try:
@@ -186,19 +261,11 @@ def try_set_bonsai_ifc_path(path_abs):
 
     # Also try to set any scene string props that look like IFC path
     scene = bpy.context.scene
-    for attr in dir(scene):
-        obj = getattr(scene, attr, None)
-        if obj is None or not hasattr(obj, "bl_rna"):
-            continue
-        for prop in obj.bl_rna.properties:
-            if prop.type != 'STRING':
-                continue
-            pid = prop.identifier.lower()
-            if ("ifc" in pid) and ("file" in pid or "path" in pid) and ("bcf" not in pid):
-                try:
-                    setattr(obj, prop.identifier, p)
-                except:
-                    pass
+    for holder, prop_id in _ifc_path_props(scene):
+        try:
+            setattr(getattr(scene, holder), prop_id, p)
+        except:
+            pass
 
 def pick_storey(ifc):
     st = ifc.by_type("IfcBuildingStorey") or []
@@ -239,10 +306,27 @@ def place_matrix(ifc, product, M4):
 # =========================
 # SVG PARSING
 # =========================
+_LEN_RE = re.compile(r"^\s*([+-]?\d*\.?\d+(?:[eE][+-]?\d+)?)\s*([a-zA-Z%]*)\s*$")
+_COLOR_RE = re.compile(r"#([0-9a-f]{6}|[0-9a-f]{3})$|rgb\(\s*([0-9]+)\s*,\s*([0-9]+)\s*,\s*([0-9]+)\s*\)")
+_FUNC_RE = re.compile(r"([a-zA-Z]+)\s*\(([^)]*)\)")
+
 def parse_length_mm(s):
     if s is None: return None
     s = str(s).strip()
-    m = re.match(r"^\s*([+-]?\d*\.?\d+(?:[eE][+-]?\d+)?)\s*([a-zA-Z%]*)\s*$", s)
+    # Fast paths: bare numbers are px (unitless -> None), "<num>mm" is the usual Inkscape width
+    if s[-1:].isdigit() and "_" not in s:
+        try:
+            float(s)
+            return None
+        except ValueError:
+            pass
+    elif s.endswith("mm") and "_" not in s:
+        try:
+            val = float(s[:-2])
+            if math.isfinite(val): return val
+        except ValueError:
+            pass
+    m = _LEN_RE.match(s)
     if not m: return None
     val = float(m.group(1))
     unit = (m.group(2) or "").lower()
@@ -265,21 +349,20 @@ def parse_style(style_str: str):
             d[k.strip().lower()] = v.strip()
     return d
 
+@lru_cache(maxsize=256)
 def parse_color(s):
     if not s: return None
-    s = s.strip().lower()
-    if s in ("none", "transparent"): return None
-    if s.startswith("#"):
-        hx = s[1:]
-        if len(hx) == 3:
-            return (int(hx[0]*2,16), int(hx[1]*2,16), int(hx[2]*2,16))
-        if len(hx) == 6:
-            return (int(hx[0:2],16), int(hx[2:4],16), int(hx[4:6],16))
-    m = re.match(r"rgb\(\s*([0-9]+)\s*,\s*([0-9]+)\s*,\s*([0-9]+)\s*\)", s)
-    if m:
-        return (int(m.group(1)), int(m.group(2)), int(m.group(3)))
-    return None
-
+    m = _COLOR_RE.match(s.strip().lower())
+    if not m: return None
+    hx = m.group(1)
+    if hx is None:
+        return (int(m.group(2)), int(m.group(3)), int(m.group(4)))
+    r = int(hx, 16)
+    if len(hx) == 3:
+        return ((r >> 8)*17, ((r >> 4) & 15)*17, (r & 15)*17)
+    return (r >> 16, (r >> 8) & 255, r & 255)
+
+@lru_cache(maxsize=512)
 def classify_fill(rgb):
     if rgb is None: return None
     r,g,b = rgb
@@ -288,54 +371,59 @@ def classify_fill(rgb):
     if abs(r-g) < 25 and abs(g-b) < 25 and 80 < r < 200: return "door"
     return None
 
+# Affine transforms are SVG matrix(a,b,c,d,e,f) tuples: x' = a*x + c*y + e, y' = b*x + d*y + f
+IDENT = (1.0, 0.0, 0.0, 1.0, 0.0, 0.0)
+
+def compose(A, B):
+    """A then B in SVG order (the matrix product A @ B)."""
+    a1, b1, c1, d1, e1, f1 = A
+    a2, b2, c2, d2, e2, f2 = B
+    return (a1*a2 + c1*b2, b1*a2 + d1*b2,
+            a1*c2 + c1*d2, b1*c2 + d1*d2,
+            a1*e2 + c1*f2 + e1, b1*e2 + d1*f2 + f1)
+
+@lru_cache(maxsize=4096)
 def parse_transform(transform_str: str):
-    M = np.identity(3, dtype=float)
+    M = IDENT
     if not transform_str:
         return M
     s = transform_str.strip()
-    func_re = re.compile(r"([a-zA-Z]+)\s*\(([^)]*)\)")
-    for fn, args_str in func_re.findall(s):
+    for fn, args_str in _FUNC_RE.findall(s):
         fn = fn.lower()
-        args = [a for a in re.split(r"[,\s]+", args_str.strip()) if a]
-        vals = [float(a) for a in args] if args else []
-        T = np.identity(3, dtype=float)
+        vals = list(map(float, args_str.replace(",", " ").split()))
+        T = IDENT
 
         if fn == "translate":
             tx = vals[0] if len(vals) > 0 else 0.0
             ty = vals[1] if len(vals) > 1 else 0.0
-            T = np.array([[1,0,tx],[0,1,ty],[0,0,1]], dtype=float)
+            T = (1.0, 0.0, 0.0, 1.0, tx, ty)
         elif fn == "scale":
             sx = vals[0] if len(vals) > 0 else 1.0
             sy = vals[1] if len(vals) > 1 else sx
-            T = np.array([[sx,0,0],[0,sy,0],[0,0,1]], dtype=float)
+            T = (sx, 0.0, 0.0, sy, 0.0, 0.0)
         elif fn == "rotate":
             ang = math.radians(vals[0] if len(vals)>0 else 0.0)
             cx = vals[1] if len(vals)>2 else 0.0
             cy = vals[2] if len(vals)>2 else 0.0
             c = math.cos(ang); si = math.sin(ang)
-            R = np.array([[c,-si,0],[si,c,0],[0,0,1]], dtype=float)
-            T1 = np.array([[1,0,cx],[0,1,cy],[0,0,1]], dtype=float)
-            T2 = np.array([[1,0,-cx],[0,1,-cy],[0,0,1]], dtype=float)
-            T = T1 @ R @ T2
+            # translate(cx,cy) rotate translate(-cx,-cy), closed form
+            T = (c, si, -si, c, cx - c*cx + si*cy, cy - si*cx - c*cy)
         elif fn == "matrix":
             if len(vals) >= 6:
-                a,b,c,d,e,f = vals[:6]
-                T = np.array([[a,c,e],[b,d,f],[0,0,1]], dtype=float)
+                T = tuple(vals[:6])
 
-        M = M @ T
+        M = compose(M, T)
     return M
 
 def apply_transform(points, M):
-    out = []
-    for x,y in points:
-        v = np.array([x,y,1.0], dtype=float)
-        r = M @ v
-        out.append((float(r[0]), float(r[1])))
-    return out
+    # All points in one affine op; returns an (N,2) float array
+    a, b, c, d, e, f = M
+    P = np.asarray(points, dtype=float).reshape(-1, 2)
+    return P @ np.array(((a, b), (c, d))) + (e, f)
 
 def parse_points_attr(s: str):
     if not s: return None
-    nums = [float(x) for x in re.split(r"[,\s]+", s.strip()) if x]
+    nums = list(map(float, s.replace(",", " ").split()))
     if len(nums) < 6: return None
     pts = [(nums[i], nums[i+1]) for i in range(0, len(nums), 2)]
     if pts[0] != pts[-1]:
@@ -345,21 +433,50 @@ def parse_points_attr(s: str):
 def rect_to_poly(x,y,w,h):
     return [(x,y),(x+w,y),(x+w,y+h),(x,y+h),(x,y)]
 
-def iter_floorplan_shapes(root):
+def _iterparse(svg_path, events):
+    if LET is not None:
+        return LET.iterparse(svg_path, events=events, huge_tree=True, recover=True)
+    return ET.iterparse(svg_path, events=events)
+
+def _parse_svg(svg_path):
+    # Whole-tree parse for the rewrite passes; lxml keeps the original namespace prefixes on write
+    if LET is not None:
+        return LET.parse(svg_path, LET.XMLParser(huge_tree=True))
+    return ET.parse(svg_path)
+
+def read_svg_root(svg_path):
+    # The root element with its attributes, without parsing the rest of the file
+    for _, node in _iterparse(svg_path, ("start",)):
+        return node
+
+def iter_floorplan_shapes(svg_path, scale=(1.0, 1.0)):
     def strip_ns(tag):
         return tag.split("}",1)[-1] if "}" in tag else tag
 
-    def walk(node, parent_M):
-        M_here = parent_M @ parse_transform(node.get("transform"))
+    # Streaming pre-order walk: push the matrix on start, pop (and free the node) on end.
+    # scale=(sx, sy) is folded into the root matrix, so shapes come out already scaled.
+    stack = [(float(scale[0]), 0.0, 0.0, float(scale[1]), 0.0, 0.0)]
+    nodes = []
+    for ev, node in _iterparse(svg_path, ("start", "end")):
+        if ev == "end":
+            stack.pop()
+            nodes.pop()
+            node.clear()
+            # Drop finished earlier siblings too, so the parent does not keep a list of empty shells
+            if nodes:
+                parent = nodes[-1]
+                while len(parent) and parent[0] is not node:
+                    del parent[0]
+            continue
+        nodes.append(node)
+        if not isinstance(node.tag, str):
+            stack.append(stack[-1])
+            continue
+        t = node.get("transform")
+        M_here = compose(stack[-1], parse_transform(t)) if t else stack[-1]
+        stack.append(M_here)
         tag = strip_ns(node.tag)
 
-        style = parse_style(node.get("style"))
-        fill = node.get("fill") or style.get("fill")
-        rgb = parse_color(fill)
-        cls = classify_fill(rgb)
-
-        elem_id = node.get("id") or node.get("{http://www.inkscape.org/namespaces/inkscape}label") or ""
-
         poly = None
         if tag == "rect":
             x = float(node.get("x") or 0.0)
@@ -374,20 +491,24 @@ def iter_floorplan_shapes(root):
             # plan.svg is rect-based; if you later use paths, add a proper path->poly here
             poly = None
 
-        if poly and cls in ("wall","window","door"):
-            poly_t = apply_transform(poly, M_here)
-            yield (cls, poly_t, elem_id)
-
-        for ch in list(node):
-            yield from walk(ch, M_here)
+        # Fill/style only matter for shapes
+        if poly:
+            fill = node.get("fill")
+            if not fill:
+                style = node.get("style")
+                fill = parse_style(style).get("fill") if style else None
+            cls = classify_fill(parse_color(fill)) if fill else None
 
-    yield from walk(root, np.identity(3, dtype=float))
+            if cls in ("wall","window","door"):
+                elem_id = node.get("id") or node.get("{http://www.inkscape.org/namespaces/inkscape}label") or ""
+                poly_t = apply_transform(poly, M_here)
+                yield (cls, poly_t, elem_id)
 
 def compute_svg_unit_to_meter(root):
     vb = root.get("viewBox")
     vb_w = None
     if vb:
-        parts = [float(x) for x in re.split(r"[,\s]+", vb.strip()) if x]
+        parts = list(map(float, vb.replace(",", " ").split()))
         if len(parts) == 4:
             vb_w = parts[2]
     width_mm = parse_length_mm(root.get("width"))
@@ -402,31 +523,126 @@ def compute_svg_unit_to_meter(root):
 # GEOMETRY HELPERS
 # =========================
 def poly_centroid(pts):
-    xs = [p[0] for p in pts[:-1]]
-    ys = [p[1] for p in pts[:-1]]
-    return (sum(xs)/len(xs), sum(ys)/len(ys))
+    c = np.asarray(pts, dtype=float)[:-1].mean(axis=0)
+    return (float(c[0]), float(c[1]))
 
-def dist_point_to_segment(px,py, ax,ay, bx,by):
+def dist2_point_to_segment(px,py, ax,ay, bx,by):
+    # Squared distance: callers only compare, and sqrt the winner
     vx = bx-ax; vy = by-ay
     wx = px-ax; wy = py-ay
     vv = vx*vx + vy*vy
     if vv <= 1e-12:
-        return math.hypot(px-ax, py-ay), 0.0
+        return wx*wx + wy*wy, 0.0
     t = (wx*vx + wy*vy) / vv
     t = max(0.0, min(1.0, t))
-    cx = ax + t*vx
-    cy = ay + t*vy
-    return math.hypot(px-cx, py-cy), t
-
-def closest_wall_edge(wall_poly, px, py):
-    best = (1e18, None, None)
-    for i in range(len(wall_poly)-1):
-        ax,ay = wall_poly[i]
-        bx,by = wall_poly[i+1]
-        d,t = dist_point_to_segment(px,py, ax,ay, bx,by)
-        if d < best[0]:
-            best = (d, (ax,ay,bx,by), t)
-    return best
+    dx = px - (ax + t*vx)
+    dy = py - (ay + t*vy)
+    return dx*dx + dy*dy, t
+
+def wall_edges(wall_poly):
+    """Edge arrays (A, B, V=B-A, |V|^2) of a wall polygon; compute once per wall and reuse."""
+    P = np.asarray(wall_poly, dtype=float)
+    A = P[:-1]; B = P[1:]
+    V = B - A
+    return A, B, V, (V*V).sum(axis=1)
+
+def closest_wall_edge(wall_poly, px, py, edges=None):
+    A, B, V, VV = edges if edges is not None else wall_edges(wall_poly)
+    if not len(A):
+        return (1e18, None, None)
+    d2, t = _edge_dist2(A, V, VV, px, py)
+    i = int(d2.argmin())
+    return (math.sqrt(d2[i]), (float(A[i, 0]), float(A[i, 1]), float(B[i, 0]), float(B[i, 1])), float(t[i]))
+
+def _edge_dist2(A, V, VV, px, py):
+    # All edges at once: clamp the projection to [0,1]; degenerate edges measure to A.
+    # Squared distances; only the winner needs the sqrt
+    W = np.subtract((px, py), A)
+    ok = VV > 1e-12
+    t = np.where(ok, np.clip((W*V).sum(axis=1) / np.where(ok, VV, 1.0), 0.0, 1.0), 0.0)
+    C = A + t[:, None]*V
+    dx = px - C[:, 0]; dy = py - C[:, 1]
+    return dx*dx + dy*dy, t
+
+def build_edge_index(wall_polys):
+    """
+    Stack the edges of all walls (in wall order) into one index for host-wall lookup.
+    With scipy, also a KD-tree over edge midpoints.
+    """
+    edges = [wall_edges(poly) for poly in wall_polys]
+    idx = {
+        "A": np.concatenate([e[0] for e in edges]) if edges else np.empty((0, 2)),
+        "B": np.concatenate([e[1] for e in edges]) if edges else np.empty((0, 2)),
+        "wall": np.repeat(np.arange(len(edges)), [len(e[0]) for e in edges]),
+        "tree": None,
+    }
+    idx["V"] = idx["B"] - idx["A"]
+    idx["VV"] = (idx["V"]*idx["V"]).sum(axis=1)
+    if cKDTree is not None and len(idx["A"]):
+        idx["tree"] = cKDTree((idx["A"] + idx["B"]) * 0.5)
+        idx["half"] = 0.5*math.sqrt(float(idx["VV"].max()))
+    return idx
+
+def closest_edge_in_index(idx, px, py):
+    """Closest wall edge over all walls: (dist, wall_index, (ax,ay,bx,by), t). First edge wins ties."""
+    A = idx["A"]
+    if not len(A):
+        return (1e18, None, None, None)
+    tree = idx["tree"]
+    if tree is not None:
+        # Nearest midpoints give an upper bound; every edge that can beat it has its
+        # midpoint within bound + half the longest edge, so the answer stays exact
+        _, near = tree.query((px, py), k=min(8, len(A)))
+        near = np.atleast_1d(near)
+        d2, _ = _edge_dist2(A[near], idx["V"][near], idx["VV"][near], px, py)
+        cand = np.array(sorted(tree.query_ball_point((px, py), math.sqrt(d2.min()) + idx["half"] + 1e-9)), dtype=int)
+        d2, t = _edge_dist2(A[cand], idx["V"][cand], idx["VV"][cand], px, py)
+        j = int(d2.argmin()); i = int(cand[j])
+        d, t = math.sqrt(d2[j]), float(t[j])
+    else:
+        d2, t = _edge_dist2(A, idx["V"], idx["VV"], px, py)
+        i = int(d2.argmin())
+        d, t = math.sqrt(d2[i]), float(t[i])
+    return _edge_hit(idx, i, d, t)
+
+_EDGE_BROADCAST_MAX = 1 << 20  # openings x edges; keeps the (M,E,2) temporaries around 16 MB each
+
+def closest_edges_in_index(idx, pts):
+    """closest_edge_in_index for a batch of points; with the KD-tree, each tree query runs once for the whole batch."""
+    P = np.asarray(pts, dtype=float).reshape(-1, 2)
+    A, V, VV, tree = idx["A"], idx["V"], idx["VV"], idx["tree"]
+    if tree is None and len(A) and len(P) and len(P)*len(A) <= _EDGE_BROADCAST_MAX:
+        # No tree, modest plan: every point against every edge as one (M,E) broadcast, same arithmetic as _edge_dist2
+        W = P[:, None, :] - A
+        ok = VV > 1e-12
+        t = np.where(ok, np.clip((W*V).sum(axis=2) / np.where(ok, VV, 1.0), 0.0, 1.0), 0.0)
+        C = A + t[:, :, None]*V
+        dx = P[:, 0:1] - C[:, :, 0]; dy = P[:, 1:2] - C[:, :, 1]
+        d2 = dx*dx + dy*dy
+        return [_edge_hit(idx, i, math.sqrt(d2[m, i]), float(t[m, i])) for m, i in enumerate(d2.argmin(axis=1).tolist())]
+    if tree is None or not len(A) or not len(P):
+        return [closest_edge_in_index(idx, px, py) for px, py in P.tolist()]
+
+    # Upper bound per point from its nearest midpoints (same bound as the single-point query)
+    _, near = tree.query(P, k=min(8, len(A)))
+    near = near.reshape(len(P), -1)
+    An = A[near]; Vn = V[near]; VVn = VV[near]
+    ok = VVn > 1e-12
+    t = np.where(ok, np.clip(((P[:, None, :] - An)*Vn).sum(axis=2) / np.where(ok, VVn, 1.0), 0.0, 1.0), 0.0)
+    D = P[:, None, :] - (An + t[:, :, None]*Vn)
+    bound = np.sqrt((D*D).sum(axis=2).min(axis=1))
+
+    out = []
+    for (px, py), cand in zip(P.tolist(), tree.query_ball_point(P, bound + idx["half"] + 1e-9)):
+        cand = np.array(sorted(cand), dtype=int)
+        d2, t = _edge_dist2(A[cand], V[cand], VV[cand], px, py)
+        j = int(d2.argmin())
+        out.append(_edge_hit(idx, int(cand[j]), math.sqrt(d2[j]), float(t[j])))
+    return out
+
+def _edge_hit(idx, i, d, t):
+    A, B = idx["A"], idx["B"]
+    return (d, int(idx["wall"][i]), (float(A[i, 0]), float(A[i, 1]), float(B[i, 0]), float(B[i, 1])), t)
 
 def unit(vx,vy):
     n = math.hypot(vx,vy)
@@ -434,16 +650,21 @@ def unit(vx,vy):
         return (1.0, 0.0)
     return (vx/n, vy/n)
 
-def build_xy_rotation_matrix(x, y, z, ux, uy):
-    vx, vy = (-uy, ux)
-    return np.array([
-        [ux, vx, 0.0, x],
-        [uy, vy, 0.0, y],
-        [0.0,0.0,1.0, z],
-        [0.0,0.0,0.0,1.0]
-    ], dtype=float)
+_ROT_TEMPLATE = np.eye(4)
+
+def build_xy_rotation_matrix(x, y, z, ux, uy, out=None):
+    # Copy the identity (or refill out, an earlier result) and fill only the variable cells; columns are (u, v=(-uy,ux), z, t)
+    m = _ROT_TEMPLATE.copy() if out is None else out
+    m[0, 0] = ux; m[0, 1] = -uy; m[0, 3] = x
+    m[1, 0] = uy; m[1, 1] = ux;  m[1, 3] = y
+    m[2, 3] = z
+    return m
 
 def opening_width_from_rect(poly_w, ux, uy):
+    if len(poly_w) > 8:
+        # Long outlines: both projections in one matmul; small rects stay on the list path
+        UV = np.asarray(poly_w, dtype=float)[:-1] @ np.array(((ux, -uy), (uy, ux)))
+        return float(np.ptp(UV, axis=0).max())
     vx, vy = (-uy, ux)
     us = [p[0]*ux + p[1]*uy for p in poly_w[:-1]]
     vs = [p[0]*vx + p[1]*vy for p in poly_w[:-1]]
@@ -453,8 +674,16 @@ def opening_width_from_rect(poly_w, ux, uy):
 # =========================
 # TYPE RESOLUTION (CASE-INSENSITIVE)
 # =========================
+_NORM_RE = re.compile(r"[^a-z0-9]+")
+_TOKEN_RE = re.compile(r"[^a-z0-9_]+")
+
+@lru_cache(maxsize=1024)
 def _norm(s: str) -> str:
-    return re.sub(r"[^a-z0-9]+", "", (s or "").lower())
+    return _NORM_RE.sub("", (s or "").lower())
+
+# Type keys paired with their normalized form, for the substring fallback in normalize_type_token
+_WIN_TYPE_KEYS_N = tuple((k, _norm(k)) for k in WIN_TYPE_KEYS)
+_DOOR_TYPE_KEYS_N = tuple((k, _norm(k)) for k in DOOR_TYPE_KEYS)
 
 def find_type_ci(ifc, cls: str, name: str):
     target = _norm(name)
@@ -465,10 +694,21 @@ def find_type_ci(ifc, cls: str, name: str):
             return t
     return None
 
+def build_type_index(ifc, cls: str):
+    # {normalized name: type} for repeated find_type_ci-style lookups; first match wins, as the scan does
+    idx = {}
+    for t in (ifc.by_type(cls) or []):
+        idx.setdefault(_norm(getattr(t, "Name", "") or ""), t)
+    return idx
+
+def find_type_in(idx, name: str):
+    key = _norm(name)
+    return idx.get(key) if key else None
+
 def normalize_type_token(kind: str, raw: str):
     s = (raw or "").strip().lower()
     s = s.replace(" ", "_").replace("__", "_")
-    s = re.sub(r"[^a-z0-9_]+", "_", s)
+    s = _TOKEN_RE.sub("_", s)
 
     if kind == "WINDOW":
         if "triple" in s and "horizontal" in s: return "triple_horizontal"
@@ -476,8 +716,9 @@ def normalize_type_token(kind: str, raw: str):
         if "double" in s and "horizontal" in s: return "double_horizontal"
         if "double" in s and "vertical"   in s: return "double_vertical"
         if "single" in s: return "single"
-        for k in WIN_TYPE_KEYS:
-            if _norm(k) in _norm(s): return k
+        sn = _norm(s)
+        for k, kn in _WIN_TYPE_KEYS_N:
+            if kn in sn: return k
         return DEFAULT_WIN_TYPE
 
     if kind == "DOOR":
@@ -485,8 +726,9 @@ def normalize_type_token(kind: str, raw: str):
         if "double" in s and "slide" in s: return "double_slide"
         if "single" in s and "swing" in s: return "single_swing"
         if "single" in s and "slide" in s: return "single_slide"
-        for k in DOOR_TYPE_KEYS:
-            if _norm(k) in _norm(s): return k
+        sn = _norm(s)
+        for k, kn in _DOOR_TYPE_KEYS_N:
+            if kn in sn: return k
         return DEFAULT_DOOR_TYPE
 
     return s
@@ -515,12 +757,16 @@ def parse_spec_from_eid(eid: str):
     raw_type = toks[1]
     type_token = normalize_type_token(kind, raw_type)
 
-    nums = []
-    for t in toks[2:]:
-        try:
-            nums.append(float(t))
-        except ValueError:
-            break
+    try:
+        nums = list(map(float, toks[2:]))
+    except ValueError:
+        # Keep the leading numeric run
+        nums = []
+        for t in toks[2:]:
+            try:
+                nums.append(float(t))
+            except ValueError:
+                break
 
     if kind == "WINDOW":
         width  = nums[0] if len(nums) >= 1 else None
@@ -537,11 +783,21 @@ def parse_spec_from_eid(eid: str):
 # =========================
 # OPENING + WALL GEOMETRY
 # =========================
+# Opening profiles per model and footprint; openings of one size extrude the same profile:
+# {(id(ifc), width, depth): (ifc, profile)}
+_OPENING_PROFILES = {}
+
 def make_opening_rep(ifc, ctx, width, depth_across, height):
-    pts = [(-width/2, -depth_across/2), (width/2, -depth_across/2),
-           (width/2, depth_across/2), (-width/2, depth_across/2),
-           (-width/2, -depth_across/2)]
-    prof = run("profile.add_arbitrary_profile", ifc, profile=pts, name="OPENING_PROFILE")
+    key = (id(ifc), round(width, 6), round(depth_across, 6))
+    hit = _OPENING_PROFILES.get(key)
+    if hit is not None and hit[0] is ifc:
+        prof = hit[1]
+    else:
+        pts = [(-width/2, -depth_across/2), (width/2, -depth_across/2),
+               (width/2, depth_across/2), (-width/2, depth_across/2),
+               (-width/2, -depth_across/2)]
+        prof = run("profile.add_arbitrary_profile", ifc, profile=pts, name="OPENING_PROFILE")
+        _OPENING_PROFILES[key] = (ifc, prof)
     rep  = run("geometry.add_profile_representation", ifc, context=ctx, profile=prof, depth=height)
     return rep
 
@@ -554,13 +810,53 @@ def make_wall_rep_from_poly(ifc, ctx, poly_local, height):
 # =========================
 # MAPPED-ITEM SCALING (ROBUST)
 # =========================
+_BBOX_SETTINGS = ifcgeom.settings()
+_BBOX_SETTINGS.set(_BBOX_SETTINGS.USE_WORLD_COORDS, False)
+
+# Local bboxes of purely mapped products, keyed by their mapping sources + targets
+_BBOX_CACHE = {}
+
+def _target_sig(mt):
+    if mt is None: return None
+    lo = getattr(mt, "LocalOrigin", None)
+    return (mt.is_a(),
+            tuple(getattr(getattr(mt, k, None), "DirectionRatios", None) or () for k in ("Axis1", "Axis2", "Axis3")),
+            tuple(lo.Coordinates) if lo else None,
+            getattr(mt, "Scale", None), getattr(mt, "Scale2", None), getattr(mt, "Scale3", None))
+
+def _mapped_bbox_key(product):
+    # Only products whose geometry is nothing but mapped items share shapes (e.g. instances of one type)
+    key = []
+    for rep in (product.Representation.Representations or []):
+        for it in (rep.Items or []):
+            if not it.is_a("IfcMappedItem"):
+                return None
+            key.append((it.MappingSource.id(), _target_sig(getattr(it, "MappingTarget", None))))
+    return tuple(key) or None
+
 def bbox_local(product):
-    settings = ifcgeom.settings()
-    settings.set(settings.USE_WORLD_COORDS, False)
-    shape = ifcgeom.create_shape(settings, product)
+    key = _mapped_bbox_key(product)
+    if key is not None and key in _BBOX_CACHE:
+        return _BBOX_CACHE[key]
+    shape = ifcgeom.create_shape(_BBOX_SETTINGS, product)
     v = shape.geometry.verts
     xs = v[0::3]; ys = v[1::3]; zs = v[2::3]
-    return (min(xs), min(ys), min(zs), max(xs), max(ys), max(zs))
+    bb = (min(xs), min(ys), min(zs), max(xs), max(ys), max(zs))
+    if key is not None:
+        _BBOX_CACHE[key] = bb
+    return bb
+
+# Shared unit IfcDirections per model and dimension: {(id(ifc), dim): (ifc, axes)}
+_UNIT_AXES = {}
+
+def _unit_axes(ifc, dim):
+    hit = _UNIT_AXES.get((id(ifc), dim))
+    if hit is not None and hit[0] is ifc:
+        return hit[1]
+    ratios = ((1.0,0.0,0.0), (0.0,1.0,0.0), (0.0,0.0,1.0)) if dim == 3 else ((1.0,0.0), (0.0,1.0))
+    axes = tuple(ifc.create_entity("IfcDirection", DirectionRatios=r) for r in ratios)
+    _UNIT_AXES[(id(ifc), dim)] = (ifc, axes)
+    return axes
 
 def set_mapped_scale_and_center_ALL_REPS_KEEP_DEPTH(ifc, product, target_width, target_height):
     """
@@ -590,26 +886,31 @@ def set_mapped_scale_and_center_ALL_REPS_KEEP_DEPTH(ifc, product, target_width,
     ox = -sx*cx
     oy = -sy*cy
 
+    reps = product.Representation.Representations or []
+
+    # Template already at the target size and centred, mapped without targets: new operators would be identities
+    if abs(sx-1.0) < 1e-6 and abs(sz-1.0) < 1e-6 and abs(ox) < 1e-6 and abs(oy) < 1e-6:
+        if all(getattr(it, "MappingTarget", None) is None for rep in reps for it in (rep.Items or []) if it.is_a("IfcMappedItem")):
+            return (sx, sy, sz, 0)
+
     def make_3d_op():
+        ax1, ax2, ax3 = _unit_axes(ifc, 3)
         return ifc.create_entity(
             "IfcCartesianTransformationOperator3DnonUniform",
-            Axis1=ifc.create_entity("IfcDirection", DirectionRatios=(1.0,0.0,0.0)),
-            Axis2=ifc.create_entity("IfcDirection", DirectionRatios=(0.0,1.0,0.0)),
-            Axis3=ifc.create_entity("IfcDirection", DirectionRatios=(0.0,0.0,1.0)),
+            Axis1=ax1, Axis2=ax2, Axis3=ax3,
             LocalOrigin=ifc.create_entity("IfcCartesianPoint", Coordinates=(float(ox), float(oy), 0.0)),
             Scale=float(sx), Scale2=float(sy), Scale3=float(sz)
         )
 
     def make_2d_op():
+        ax1, ax2 = _unit_axes(ifc, 2)
         return ifc.create_entity(
             "IfcCartesianTransformationOperator2DnonUniform",
-            Axis1=ifc.create_entity("IfcDirection", DirectionRatios=(1.0,0.0)),
-            Axis2=ifc.create_entity("IfcDirection", DirectionRatios=(0.0,1.0)),
+            Axis1=ax1, Axis2=ax2,
             LocalOrigin=ifc.create_entity("IfcCartesianPoint", Coordinates=(float(ox), float(oy))),
             Scale=float(sx), Scale2=float(sy)
         )
 
-    reps = product.Representation.Representations or []
     touched = 0
     for rep in reps:
         for it in (rep.Items or []):
@@ -628,7 +929,18 @@ def set_mapped_scale_and_center_ALL_REPS_KEEP_DEPTH(ifc, product, target_width,
 # =========================
 # EXPORT HELPERS (ROBUST)
 # =========================
+# Introspection caches: RNA props per operator, bpy.ops.bim names, propgroup attr per collection
+_OP_PROPS = {}
+_BIM_OPS = None
+_PROPGROUP_ATTR = {}
+
 def _op_props(op_callable):
+    try:
+        key = op_callable.idname_py()
+    except:
+        key = None
+    if key in _OP_PROPS:
+        return _OP_PROPS[key]
     try:
         rna = op_callable.get_rna_type()
         props = []
@@ -636,9 +948,23 @@ def _op_props(op_callable):
             if p.identifier in {"rna_type"}:
                 continue
             props.append(p.identifier)
-        return set(props)
+        props = frozenset(props)
     except:
-        return set()
+        return set()  # not cached: the op may register later
+    if key is not None:
+        _OP_PROPS[key] = props
+    return props
+
+# Operator-name filters for drawing/sheet discovery
+_EXPORT_VERB_RE = re.compile(r"export|plot|print|save")
+_EXPORT_TARGET_RE = re.compile(r"drawing|sheet|layout|svg|pdf")
+_ADD_VERB_RE = re.compile(r"add|assign|append")
+
+def _bim_op_names(bim):
+    global _BIM_OPS
+    if _BIM_OPS is None:
+        _BIM_OPS = tuple(dir(bim))
+    return _BIM_OPS
 
 def _call_bim_op_flexible(op_name, desired_kwargs):
     bim = getattr(bpy.ops, "bim", None)
@@ -660,12 +986,19 @@ def _call_bim_op_flexible(op_name, desired_kwargs):
         return False
 
 def _find_propgroup(scene, required_collection_name: str):
+    key = (scene.name, required_collection_name)
+    attr = _PROPGROUP_ATTR.get(key)
+    if attr:
+        pg = getattr(scene, attr, None)
+        if pg is not None and hasattr(pg, required_collection_name):
+            return pg
     for nm in ("BIMDrawingProperties", "BIMSheetProperties", "BIMDocumentProperties", "BIMProperties"):
         pg = getattr(scene, nm, None)
         if pg and hasattr(pg, required_collection_name):
             col = getattr(pg, required_collection_name)
             try:
                 _ = len(col)
+                _PROPGROUP_ATTR[key] = nm
                 return pg
             except:
                 pass
@@ -677,6 +1010,7 @@ def _find_propgroup(scene, required_collection_name: str):
             col = getattr(pg, required_collection_name)
             try:
                 _ = len(col)
+                _PROPGROUP_ATTR[key] = attr
                 return pg
             except:
                 pass
@@ -768,9 +1102,9 @@ def bonsai_add_selected_drawing_to_sheet(sheet_hint_1="A01", sheet_hint_2="untit
     ]
 
     discovered = []
-    for nm in dir(bim):
+    for nm in _bim_op_names(bim):
         low = nm.lower()
-        if ("drawing" in low) and ("sheet" in low) and (("add" in low) or ("assign" in low) or ("append" in low)):
+        if ("drawing" in low) and ("sheet" in low) and _ADD_VERB_RE.search(low):
             discovered.append(nm)
     for nm in discovered:
         if nm not in candidates:
@@ -797,6 +1131,8 @@ def bonsai_add_selected_drawing_to_sheet(sheet_hint_1="A01", sheet_hint_2="untit
 
 def bonsai_try_load_create_lists():
     # best-effort: load drawings/sheets/docs so ops register
+    global _BIM_OPS
+    _BIM_OPS = None
     for opn in ("load_project_elements", "load_drawings", "load_sheets", "load_documents"):
         if hasattr(bpy.ops.bim, opn):
             try:
@@ -829,16 +1165,13 @@ def bonsai_export_discover_and_run(export_dir):
     if not export_dir.endswith(os.sep):
         export_dir += os.sep
 
-    ops = dir(bim)
+    ops = _bim_op_names(bim)
+    op_set = set(ops)
 
     def is_candidate(name):
         low = name.lower()
-        if any(k in low for k in ("export", "plot", "print", "save")):
-            if any(k in low for k in ("drawing", "sheet", "layout", "svg", "pdf")):
-                if "cost" in low and "schedule" in low:
-                    return False
-                return True
-        return False
+        return bool(_EXPORT_VERB_RE.search(low) and _EXPORT_TARGET_RE.search(low)) \
+            and not ("cost" in low and "schedule" in low)
 
     discovered = sorted([n for n in ops if is_candidate(n)])
 
@@ -862,10 +1195,11 @@ def bonsai_export_discover_and_run(export_dir):
     ]
     queue = []
     for p in preferred:
-        if p in ops:
+        if p in op_set:
             queue.append(p)
+    queued = set(queue)
     for n in discovered:
-        if n not in queue:
+        if n not in queued:
             queue.append(n)
 
     desired = {
@@ -888,6 +1222,16 @@ def bonsai_export_discover_and_run(export_dir):
     log(f"[EXPORT] export-run success={ran_any}")
     return ran_any
 
+_EXPORT_EXTS = (".svg", ".pdf")
+
+def _find_exports(root):
+    # Streaming equivalent of glob("**/*.svg|pdf", recursive=True): hidden entries skipped
+    for dp, dns, fns in os.walk(root):
+        dns[:] = [d for d in dns if not d.startswith(".")]
+        for fn in fns:
+            if fn.endswith(_EXPORT_EXTS) and not fn.startswith("."):
+                yield os.path.join(dp, fn)
+
 def collect_and_flatten_exports():
     """
     Bonsai may write to //drawings, //layouts, //sheets, or nested inside //exports.
@@ -901,13 +1245,12 @@ def collect_and_flatten_exports():
         os.path.join(project_root, "sheets"),
         os.path.join(project_root, "documents"),
     ]
-    found = []
+    found = set()
     for c in candidates:
         if os.path.isdir(c):
-            found += glob.glob(os.path.join(c, "**", "*.svg"), recursive=True)
-            found += glob.glob(os.path.join(c, "**", "*.pdf"), recursive=True)
+            found.update(_find_exports(c))
 
-    found = sorted(set(found))
+    found = sorted(found)
     flat_dir = os.path.join(EXPORT_DIR, "_FLAT")
     os.makedirs(flat_dir, exist_ok=True)
 
@@ -947,11 +1290,60 @@ def collect_and_flatten_exports():
 # =========================
 # SHEET SVG FIX + IMAGE HREF FIX/EMBED
 # =========================
+_VB_SPLIT_RE = re.compile(r"[,\s]+")
+_ALPHA_RE = re.compile(r"[a-zA-Z]+")
+_CLIP_URL_RE = re.compile(r"url\(\s*#([^)]+)\s*\)")
+_URL_SCHEME_RE = re.compile(r"^[a-zA-Z]+:")
+
+# Parsed export SVGs shared by the fix-up / DXF passes: {abs path: (mtime_ns, size, tree)}
+_TREE_CACHE = {}
+_TREE_CACHE_MAX = 8
+_TREE_LOCK = threading.Lock()  # export sheets may be converted concurrently
+
+def _cached_svg_tree(svg_path):
+    key = os.path.abspath(svg_path)
+    hit = _TREE_CACHE.get(key)
+    if hit is None:
+        return None
+    try:
+        st = os.stat(key)
+    except OSError:
+        return None
+    return hit[2] if (hit[0], hit[1]) == (st.st_mtime_ns, st.st_size) else None
+
+def _remember_svg_tree(svg_path, tree):
+    key = os.path.abspath(svg_path)
+    st = os.stat(key)
+    with _TREE_LOCK:
+        _TREE_CACHE.pop(key, None)
+        _TREE_CACHE[key] = (st.st_mtime_ns, st.st_size, tree)
+        while len(_TREE_CACHE) > _TREE_CACHE_MAX:
+            _TREE_CACHE.pop(next(iter(_TREE_CACHE)))
+
+def _load_svg_tree(svg_path):
+    tree = _cached_svg_tree(svg_path)
+    if tree is None:
+        tree = _parse_svg(svg_path)
+        _remember_svg_tree(svg_path, tree)
+    return tree
+
+def _write_svg_tree(tree, svg_path):
+    # Writers mutate the cached tree in place: re-key it on the new file, or drop it if the write fails
+    try:
+        tree.write(svg_path, encoding="utf-8", xml_declaration=True)
+    except:
+        with _TREE_LOCK:
+            _TREE_CACHE.pop(os.path.abspath(svg_path), None)
+        raise
+    _remember_svg_tree(svg_path, tree)
+
 def _sf(v, default=0.0):
     try: return float(v)
     except: return default
 
 def _strip_ns(tag):
+    if not isinstance(tag, str):  # lxml comments / processing instructions
+        return ""
     return tag.split("}", 1)[-1] if "}" in tag else tag
 
 def _get_attr_any(el, keys):
@@ -969,68 +1361,82 @@ def _set_href(el, val):
     else:
         el.set("{http://www.w3.org/1999/xlink}href", val)
 
+def _parent_of(root, el):
+    # lxml elements know their parent; plain ElementTree needs a search from the root
+    if hasattr(el, "getparent"):
+        return el.getparent()
+    for p in root.iter():
+        for c in p:
+            if c is el:
+                return p
+    return None
+
 def _get_page_size(root):
     vb = root.get("viewBox")
     if vb:
-        parts = [p for p in re.split(r"[,\s]+", vb.strip()) if p]
+        parts = [p for p in _VB_SPLIT_RE.split(vb.strip()) if p]
         if len(parts) == 4:
             return (_sf(parts[2], 0.0), _sf(parts[3], 0.0))
     try:
-        w = float(re.sub(r"[a-zA-Z]+", "", root.get("width","0")))
-        h = float(re.sub(r"[a-zA-Z]+", "", root.get("height","0")))
+        w = float(_ALPHA_RE.sub("", root.get("width","0")))
+        h = float(_ALPHA_RE.sub("", root.get("height","0")))
         if w > 0 and h > 0:
             return (w, h)
     except:
         pass
     return (0.0, 0.0)
 
-def _choose_drawing_viewport_rect(root, page_w, page_h):
-    page_area = (page_w * page_h) if (page_w > 0 and page_h > 0) else None
-    rects = []
+def _collect_sheet_elements(root):
+    # One pass over the sheet, bucketing the elements the fix-up needs by local tag
+    buckets = {"rect": [], "image": [], "clipPath": []}
     for el in root.iter():
-        if _strip_ns(el.tag) != "rect":
-            continue
-        x = _sf(el.get("x"), 0.0)
-        y = _sf(el.get("y"), 0.0)
-        w = _sf(el.get("width"), 0.0)
-        h = _sf(el.get("height"), 0.0)
-        if w <= 1 or h <= 1:
-            continue
-        area = w*h
-        rects.append((area, x, y, w, h, el))
-
-    if not rects or not page_area:
-        return (0.0, 0.0, page_w, page_h)
-
-    cand = []
-    for area, x, y, w, h, el in rects:
-        ratio = area / page_area
-        if ratio < 0.10 or ratio > 0.90:
-            continue
-        if y > 0.60 * page_h:
-            continue
-        if h > 0.85 * page_h:
-            continue
-        cand.append((area, x, y, w, h, el))
+        b = buckets.get(_strip_ns(el.tag))
+        if b is not None:
+            b.append(el)
+    # clipPaths by id (first wins, as the document-order scan did)
+    by_id = {}
+    for c in buckets["clipPath"]:
+        cid = c.get("id")
+        if cid and cid not in by_id:
+            by_id[cid] = c
+    buckets["clipPath_by_id"] = by_id
+    return buckets
+
+_XYWH_KEYS = ("x", "y", "width", "height")
+
+def _xywh_array(els):
+    # (N,4) float array of x/y/width/height, parsed in one go; rows with odd values go through _sf
+    rows = [tuple(el.get(k) or "0" for k in _XYWH_KEYS) for el in els]
+    try:
+        return np.array(rows, dtype=np.float64).reshape(-1, 4)
+    except (ValueError, TypeError):
+        return np.array([[_sf(v, 0.0) for v in r] for r in rows], dtype=np.float64).reshape(-1, 4)
 
-    if cand:
-        cand.sort(key=lambda t: t[0], reverse=True)
-        _, x, y, w, h, _ = cand[0]
-        return (x, y, w, h)
+def _choose_drawing_viewport_rect(rect_els, page_w, page_h):
+    page_area = (page_w * page_h) if (page_w > 0 and page_h > 0) else None
+    xywh = _xywh_array(rect_els)
+    xywh = xywh[(xywh[:, 2] > 1) & (xywh[:, 3] > 1)]
 
-    rects.sort(key=lambda t: t[0], reverse=True)
-    for area, x, y, w, h, el in rects:
-        if (area / page_area) > 0.95:
-            continue
-        return (x, y, w, h)
+    if not len(xywh) or not page_area:
+        return (0.0, 0.0, page_w, page_h)
 
-    _, x, y, w, h, _ = rects[0]
+    area = xywh[:, 2] * xywh[:, 3]
+    ratio = area / page_area
+    order = np.argsort(-area, kind="stable")  # largest first, ties in document order
+
+    cand = (ratio >= 0.10) & (ratio <= 0.90) & (xywh[:, 1] <= 0.60 * page_h) & (xywh[:, 3] <= 0.85 * page_h)
+    pick = order[cand[order]]
+    if not len(pick):
+        pick = order[~(ratio[order] > 0.95)]
+    if not len(pick):
+        pick = order
+    x, y, w, h = xywh[pick[0]].tolist()
     return (x, y, w, h)
 
 def _extract_clip_id(clip_path_value: str):
     if not clip_path_value:
         return None
-    m = re.search(r"url\(\s*#([^)]+)\s*\)", clip_path_value.strip())
+    m = _CLIP_URL_RE.search(clip_path_value.strip())
     if m:
         return m.group(1).strip()
     if clip_path_value.strip().startswith("#"):
@@ -1042,6 +1448,58 @@ def _append_translate(el, dx, dy):
     t = (t + f" translate({dx:.6f},{dy:.6f})").strip()
     el.set("transform", t)
 
+_B64_CHUNK = 3 << 16  # multiple of 3: chunks encode without padding in between
+
+def _b64_file(path):
+    # Encode chunk by chunk; the raw file is never held in memory whole
+    parts = []
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size:
+            try:
+                # Map the file and encode straight out of the page cache (no read buffers)
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm, memoryview(mm) as mv:
+                    for i in range(0, len(mv), _B64_CHUNK):
+                        parts.append(base64.b64encode(mv[i:i + _B64_CHUNK]).decode("ascii"))
+                return "".join(parts)
+            except (OSError, ValueError):
+                parts = []; f.seek(0)
+        while True:
+            b = f.read(_B64_CHUNK)
+            if not b:
+                break
+            parts.append(base64.b64encode(b).decode("ascii"))
+    return "".join(parts)
+
+def _resolve_image_href(href, svg_dir, embed, max_bytes):
+    # New href for an external image: a data: URI if embeddable, else an absolute file:/// URI; None if the file is missing
+    href_clean = href.replace("\\", "/")
+    if _URL_SCHEME_RE.match(href_clean):  # absolute URL or C:\...
+        abs_path = href_clean.replace("file:///", "")
+    else:
+        abs_path = os.path.abspath(os.path.join(svg_dir, href_clean))
+
+    try:
+        st = os.stat(abs_path)
+    except (OSError, ValueError):
+        abs_path = os.path.abspath(os.path.join(svg_dir, urllib.parse.unquote(href_clean)))
+        try:
+            st = os.stat(abs_path)
+        except (OSError, ValueError):
+            return None
+
+    if embed and st.st_size <= max_bytes:
+        ext = os.path.splitext(abs_path)[1].lower()
+        mime = "image/png" if ext in (".png",) else "image/jpeg" if ext in (".jpg",".jpeg") else None
+        if mime:
+            try:
+                return f"data:{mime};base64,{_b64_file(abs_path)}"
+            except:
+                pass
+
+    uri_path = abs_path.replace("\\", "/")
+    return "file:///" + urllib.parse.quote(uri_path, safe="/:")
+
 def fix_svg_image_hrefs_and_embed(svg_path, embed=True, max_bytes=20*1024*1024):
     """
     Fix broken sheet exports by:
@@ -1049,7 +1507,7 @@ def fix_svg_image_hrefs_and_embed(svg_path, embed=True, max_bytes=20*1024*1024):
       - optionally embedding as data:image/...;base64,...
     """
     try:
-        tree = ET.parse(svg_path)
+        tree = _load_svg_tree(svg_path)
         root = tree.getroot()
     except Exception as e:
         log(f"[SVGHREF] Parse fail: {svg_path}: {e}")
@@ -1057,6 +1515,7 @@ def fix_svg_image_hrefs_and_embed(svg_path, embed=True, max_bytes=20*1024*1024):
 
     svg_dir = os.path.dirname(os.path.abspath(svg_path))
     changed = False
+    resolved = {}
 
     for el in root.iter():
         if _strip_ns(el.tag) != "image":
@@ -1065,63 +1524,34 @@ def fix_svg_image_hrefs_and_embed(svg_path, embed=True, max_bytes=20*1024*1024):
         if not href or href.lower().startswith("data:"):
             continue
 
-        href_clean = href.replace("\\", "/")
-        if re.match(r"^[a-zA-Z]+:", href_clean):  # absolute URL or C:\...
-            abs_path = href_clean.replace("file:///", "")
+        # Sheets often place the same raster many times: resolve (and encode) each href once
+        if href in resolved:
+            val = resolved[href]
         else:
-            abs_path = os.path.abspath(os.path.join(svg_dir, href_clean))
-
-        if not os.path.exists(abs_path):
-            abs_path2 = os.path.abspath(os.path.join(svg_dir, urllib.parse.unquote(href_clean)))
-            if os.path.exists(abs_path2):
-                abs_path = abs_path2
-            else:
-                continue
-
-        if embed:
-            try:
-                sz = os.path.getsize(abs_path)
-                if sz <= max_bytes:
-                    ext = os.path.splitext(abs_path)[1].lower()
-                    mime = "image/png" if ext in (".png",) else "image/jpeg" if ext in (".jpg",".jpeg") else None
-                    if mime:
-                        with open(abs_path, "rb") as f:
-                            b = f.read()
-                        data = base64.b64encode(b).decode("ascii")
-                        _set_href(el, f"data:{mime};base64,{data}")
-                        changed = True
-                        continue
-            except:
-                pass
-
-        uri_path = abs_path.replace("\\", "/")
-        uri = "file:///" + urllib.parse.quote(uri_path, safe="/:")
-        _set_href(el, uri)
+            val = resolved[href] = _resolve_image_href(href, svg_dir, embed, max_bytes)
+        if val is None:
+            continue
+        _set_href(el, val)
         changed = True
 
     if changed:
         try:
-            tree.write(svg_path, encoding="utf-8", xml_declaration=True)
+            _write_svg_tree(tree, svg_path)
         except:
             pass
     return changed
 
-def fix_sheet_svg_center_drawing(svg_path, name_hint_1="A01", name_hint_2="untitled"):
+def fix_sheet_svg_center_drawing(svg_path):
     """
     Center only the drawing image in the sheet SVG (do not move titleblock/border).
     Also removes page-filling background image if present.
+    The caller decides which SVGs are sheets (see _convert_one_export).
     """
     if not os.path.exists(svg_path):
         return False
 
-    base = os.path.basename(svg_path).lower()
-    if name_hint_1 and name_hint_1.lower() not in base:
-        return False
-    if name_hint_2 and name_hint_2.lower() not in base:
-        return False
-
     try:
-        tree = ET.parse(svg_path)
+        tree = _load_svg_tree(svg_path)
         root = tree.getroot()
     except Exception as e:
         log(f"[SHEETFIX] Parse fail {svg_path}: {e}")
@@ -1130,21 +1560,15 @@ def fix_sheet_svg_center_drawing(svg_path, name_hint_1="A01", name_hint_2="untit
     page_w, page_h = _get_page_size(root)
     page_area = (page_w * page_h) if (page_w > 0 and page_h > 0) else None
 
-    vx, vy, vw, vh = _choose_drawing_viewport_rect(root, page_w, page_h)
+    els = _collect_sheet_elements(root)
+    vx, vy, vw, vh = _choose_drawing_viewport_rect(els["rect"], page_w, page_h)
     v_cx = vx + vw*0.5
     v_cy = vy + vh*0.5
     v_area = vw*vh
 
-    parent_map = {c: p for p in root.iter() for c in p}
-
     images = []
-    for el in root.iter():
-        if _strip_ns(el.tag) != "image":
-            continue
-        ix = _sf(el.get("x"), 0.0)
-        iy = _sf(el.get("y"), 0.0)
-        iw = _sf(el.get("width"), 0.0)
-        ih = _sf(el.get("height"), 0.0)
+    img_xywh = _xywh_array(els["image"]).tolist()
+    for el, (ix, iy, iw, ih) in zip(els["image"], img_xywh):
         if iw <= 0 or ih <= 0:
             continue
         href = (_get_href(el) or "").strip().lower()
@@ -1165,7 +1589,7 @@ def fix_sheet_svg_center_drawing(svg_path, name_hint_1="A01", name_hint_2="untit
                 bg = im
                 break
         if bg is not None:
-            p = parent_map.get(bg["el"])
+            p = _parent_of(root, bg["el"])
             if p is not None:
                 p.remove(bg["el"])
                 changed = True
@@ -1174,7 +1598,7 @@ def fix_sheet_svg_center_drawing(svg_path, name_hint_1="A01", name_hint_2="untit
 
     if not images:
         if changed:
-            tree.write(svg_path, encoding="utf-8", xml_declaration=True)
+            _write_svg_tree(tree, svg_path)
         return changed
 
     # Choose most likely drawing image
@@ -1207,75 +1631,89 @@ def fix_sheet_svg_center_drawing(svg_path, name_hint_1="A01", name_hint_2="untit
 
     clip_id = draw_img.get("clip_id")
     if clip_id:
-        clip_el = None
-        for c in root.iter():
-            if _strip_ns(c.tag) == "clipPath" and (c.get("id") or "") == clip_id:
-                clip_el = c
-                break
+        clip_el = els["clipPath_by_id"].get(clip_id)
         if clip_el is not None:
             _append_translate(clip_el, dx, dy)
             changed = True
             log(f"[SHEETFIX] Moved clipPath #{clip_id} with drawing.")
 
     if changed:
-        tree.write(svg_path, encoding="utf-8", xml_declaration=True)
+        _write_svg_tree(tree, svg_path)
     return changed
 
 
 # =========================
 # SVG -> DXF (VECTOR-ONLY)
 # =========================
+_VECTOR_TAGS = frozenset(("path", "line", "polyline", "polygon", "rect", "circle", "ellipse"))
+
 def svg_has_vector_linework(svg_path):
-    try:
-        tree = ET.parse(svg_path)
-        root = tree.getroot()
-    except:
+    # If there are *only* images and no vector primitives, DXF would be empty.
+    tree = _cached_svg_tree(svg_path)
+    if tree is not None:
+        for el in tree.getroot().iter():
+            tag = _strip_ns(el.tag)
+            if tag in _VECTOR_TAGS and (tag != "path" or (el.get("d") or "").strip()):
+                return True
         return False
 
-    # If there are *only* images and no vector primitives, DXF would be empty.
-    has_vector = False
-    for el in root.iter():
-        tag = _strip_ns(el.tag)
-        if tag == "image":
-            continue
-        if tag in ("path","line","polyline","polygon","rect","circle","ellipse"):
-            if tag == "path" and (el.get("d") or "").strip():
-                has_vector = True
-                break
-            if tag != "path":
-                has_vector = True
-                break
-    return has_vector
+    # Not parsed yet: stream, stop at the first primitive, free finished nodes as we go
+    try:
+        for ev, el in _iterparse(svg_path, ("start", "end")):
+            if ev == "end":
+                el.clear()
+                continue
+            tag = _strip_ns(el.tag)
+            if tag in _VECTOR_TAGS and (tag != "path" or (el.get("d") or "").strip()):
+                return True
+    except:
+        pass
+    return False
 
 def _svg_viewbox_size(root):
     vb = root.get("viewBox")
     if vb:
-        parts = [p for p in re.split(r"[,\s]+", vb.strip()) if p]
+        parts = [p for p in _VB_SPLIT_RE.split(vb.strip()) if p]
         if len(parts) == 4:
             return (float(parts[2]), float(parts[3]))
     try:
-        w = float(re.sub(r"[a-zA-Z]+", "", root.get("width","1000")) or 1000)
-        h = float(re.sub(r"[a-zA-Z]+", "", root.get("height","1000")) or 1000)
+        w = float(_ALPHA_RE.sub("", root.get("width","1000")) or 1000)
+        h = float(_ALPHA_RE.sub("", root.get("height","1000")) or 1000)
         return (w,h)
     except:
         return (1000.0, 1000.0)
 
+_PATH_TOKEN_RE = re.compile(r"[MmLlHhVvCcQqAaZz]|-?\d*\.?\d+(?:[eE][+-]?\d+)?")
+_PATH_CMDS = frozenset("MmLlHhVvCcQqAaZz")
+
 def _svg_path_tokenize(d):
-    return re.findall(r"[MmLlHhVvCcQqAaZz]|-?\d*\.?\d+(?:[eE][+-]?\d+)?", d or "")
-
-def _bezier_cubic(p0, p1, p2, p3, t):
-    u = 1.0 - t
-    return (
-        u*u*u*p0[0] + 3*u*u*t*p1[0] + 3*u*t*t*p2[0] + t*t*t*p3[0],
-        u*u*u*p0[1] + 3*u*u*t*p1[1] + 3*u*t*t*p2[1] + t*t*t*p3[1],
-    )
-
-def _bezier_quad(p0, p1, p2, t):
-    u = 1.0 - t
-    return (
-        u*u*p0[0] + 2*u*t*p1[0] + t*t*p2[0],
-        u*u*p0[1] + 2*u*t*p1[1] + t*t*p2[1],
-    )
+    return _PATH_TOKEN_RE.findall(d or "")
+
+# Bernstein weights for t = k/CURVE_SEGMENTS, k = 1..CURVE_SEGMENTS (t = 0 is the current point)
+_CURVE_T = np.arange(1, CURVE_SEGMENTS + 1, dtype=float) / CURVE_SEGMENTS
+_CURVE_U = 1.0 - _CURVE_T
+_CUBIC_BASIS = np.column_stack((_CURVE_U**3, 3*_CURVE_U**2*_CURVE_T, 3*_CURVE_U*_CURVE_T**2, _CURVE_T**3))
+_QUAD_BASIS = np.column_stack((_CURVE_U**2, 2*_CURVE_U*_CURVE_T, _CURVE_T**2))
+
+def _bezier_cubic(p0, p1, p2, p3):
+    return _CUBIC_BASIS @ np.array((p0, p1, p2, p3), dtype=float)
+
+def _bezier_quad(p0, p1, p2):
+    return _QUAD_BASIS @ np.array((p0, p1, p2), dtype=float)
+
+def _stack_points(pieces):
+    # One (N,2) array from single (x, y) points and sampled (k,2) curve arrays, in order
+    out = []; run = []
+    for p in pieces:
+        if isinstance(p, tuple):
+            run.append(p)
+        else:
+            if run:
+                out.append(np.array(run, dtype=float)); run = []
+            out.append(p)
+    if run:
+        out.append(np.array(run, dtype=float))
+    return out[0] if len(out) == 1 else np.concatenate(out)
 
 def _vector_angle(ux, uy, vx, vy):
     dot = ux*vx + uy*vy
@@ -1284,7 +1722,7 @@ def _vector_angle(ux, uy, vx, vy):
 
 def _arc_to_points(x1, y1, x2, y2, rx, ry, phi_deg, large_arc, sweep, segments):
     if rx == 0 or ry == 0:
-        return [(x2, y2)]
+        return np.array(((x2, y2),), dtype=float)
     rx = abs(rx); ry = abs(ry)
     phi = math.radians(phi_deg % 360.0)
     cosphi = math.cos(phi); sinphi = math.sin(phi)
@@ -1303,7 +1741,7 @@ def _arc_to_points(x1, y1, x2, y2, rx, ry, phi_deg, large_arc, sweep, segments):
     num = (rx*rx)*(ry*ry) - (rx*rx)*(y1p*y1p) - (ry*ry)*(x1p*x1p)
     den = (rx*rx)*(y1p*y1p) + (ry*ry)*(x1p*x1p)
     if den == 0:
-        return [(x2, y2)]
+        return np.array(((x2, y2),), dtype=float)
     c = math.sqrt(max(0.0, num/den))
     if bool(large_arc) == bool(sweep):
         c = -c
@@ -1327,21 +1765,18 @@ def _arc_to_points(x1, y1, x2, y2, rx, ry, phi_deg, large_arc, sweep, segments):
     elif sweep and dtheta < 0:
         dtheta += 2*math.pi
 
-    pts = []
-    for k in range(1, segments+1):
-        t = k/segments
-        ang = theta1 + dtheta*t
-        x = cx + rx*math.cos(phi)*math.cos(ang) - ry*math.sin(phi)*math.sin(ang)
-        y = cy + rx*math.sin(phi)*math.cos(ang) + ry*math.cos(phi)*math.sin(ang)
-        pts.append((x,y))
-    return pts
+    ang = theta1 + dtheta*(np.arange(1, segments+1, dtype=float)/segments)
+    cos_a = np.cos(ang); sin_a = np.sin(ang)
+    xs = cx + rx*cosphi*cos_a - ry*sinphi*sin_a
+    ys = cy + rx*sinphi*cos_a + ry*cosphi*sin_a
+    return np.column_stack((xs, ys))
 
 def _path_to_polylines(d):
     toks = _svg_path_tokenize(d)
     if not toks:
         return []
+    n = len(toks)
     i = 0
-    cmd = None
     x = y = 0.0
     sx = sy = 0.0
     cur = []
@@ -1352,119 +1787,107 @@ def _path_to_polylines(d):
         v = float(toks[i]); i += 1
         return v
 
-    while i < len(toks):
+    def close(rel):
+        nonlocal cur, x, y
+        if cur:
+            cur.append((sx, sy))
+            polys.append(_stack_points(cur))
+            cur = []
+        x, y = sx, sy
+
+    def move(rel):
+        nonlocal cur, x, y, sx, sy, handler
+        nx = num(); ny = num()
+        if rel:
+            x += nx; y += ny
+        else:
+            x, y = nx, ny
+        sx, sy = x, y
+        if cur:
+            polys.append(_stack_points(cur))
+        cur = [(x, y)]
+        handler = line  # further pairs are implicit lineto
+
+    def line(rel):
+        nonlocal x, y
+        nx = num(); ny = num()
+        if rel:
+            x += nx; y += ny
+        else:
+            x, y = nx, ny
+        cur.append((x, y))
+
+    def hline(rel):
+        nonlocal x
+        nx = num()
+        x = x + nx if rel else nx
+        cur.append((x, y))
+
+    def vline(rel):
+        nonlocal y
+        ny = num()
+        y = y + ny if rel else ny
+        cur.append((x, y))
+
+    def cubic(rel):
+        nonlocal x, y
+        x1 = num(); y1 = num()
+        x2 = num(); y2 = num()
+        x3 = num(); y3 = num()
+        p0 = (x, y)
+        if rel:
+            x1 += x; y1 += y; x2 += x; y2 += y; x3 += x; y3 += y
+        x, y = x3, y3
+        cur.append(_bezier_cubic(p0, (x1, y1), (x2, y2), (x3, y3)))
+
+    def quad(rel):
+        nonlocal x, y
+        x1 = num(); y1 = num()
+        x2 = num(); y2 = num()
+        p0 = (x, y)
+        if rel:
+            x1 += x; y1 += y; x2 += x; y2 += y
+        x, y = x2, y2
+        cur.append(_bezier_quad(p0, (x1, y1), (x2, y2)))
+
+    def arc(rel):
+        nonlocal x, y
+        rx = num(); ry = num()
+        phi = num()
+        large_arc = int(num())
+        sweep = int(num())
+        x2 = num(); y2 = num()
+        if rel:
+            x2 += x; y2 += y
+        cur.append(_arc_to_points(x, y, x2, y2, rx, ry, phi, large_arc, sweep, CURVE_SEGMENTS))
+        x, y = x2, y2
+
+    handlers = {"M": move, "L": line, "H": hline, "V": vline, "C": cubic, "Q": quad, "A": arc, "Z": close}
+    handler = None
+    rel = False
+    while i < n:
         t = toks[i]
-        if re.match(r"^[MmLlHhVvCcQqAaZz]$", t):
-            cmd = t
+        if t in _PATH_CMDS:
+            # Command letter: select the handler; Z acts immediately
             i += 1
-            if cmd in "Zz":
-                if cur:
-                    cur.append((sx, sy))
-                    polys.append(cur)
-                    cur = []
-                x, y = sx, sy
+            rel = t.islower()
+            handler = handlers[t.upper()]
+            if handler is close:
+                close(rel)
             continue
 
-        if cmd is None:
-            break
-
-        if cmd in "Mm":
-            nx = num(); ny = num()
-            if cmd == "m":
-                x += nx; y += ny
-            else:
-                x, y = nx, ny
-            sx, sy = x, y
-            if cur:
-                polys.append(cur)
-            cur = [(x, y)]
-            cmd = "L" if cmd == "M" else "l"
-
-        elif cmd in "Ll":
-            nx = num(); ny = num()
-            if cmd == "l":
-                x += nx; y += ny
-            else:
-                x, y = nx, ny
-            cur.append((x, y))
-
-        elif cmd in "Hh":
-            nx = num()
-            x = x + nx if cmd == "h" else nx
-            cur.append((x, y))
-
-        elif cmd in "Vv":
-            ny = num()
-            y = y + ny if cmd == "v" else ny
-            cur.append((x, y))
-
-        elif cmd in "Cc":
-            x1 = num(); y1 = num()
-            x2 = num(); y2 = num()
-            x3 = num(); y3 = num()
-            if cmd == "c":
-                p0 = (x, y)
-                p1 = (x + x1, y + y1)
-                p2 = (x + x2, y + y2)
-                p3 = (x + x3, y + y3)
-                x, y = p3
-            else:
-                p0 = (x, y)
-                p1 = (x1, y1)
-                p2 = (x2, y2)
-                p3 = (x3, y3)
-                x, y = p3
-            for k in range(1, CURVE_SEGMENTS + 1):
-                tt = k / CURVE_SEGMENTS
-                cur.append(_bezier_cubic(p0, p1, p2, p3, tt))
-
-        elif cmd in "Qq":
-            x1 = num(); y1 = num()
-            x2 = num(); y2 = num()
-            if cmd == "q":
-                p0 = (x, y)
-                p1 = (x + x1, y + y1)
-                p2 = (x + x2, y + y2)
-                x, y = p2
-            else:
-                p0 = (x, y)
-                p1 = (x1, y1)
-                p2 = (x2, y2)
-                x, y = p2
-            for k in range(1, CURVE_SEGMENTS + 1):
-                tt = k / CURVE_SEGMENTS
-                cur.append(_bezier_quad(p0, p1, p2, tt))
-
-        elif cmd in "Aa":
-            rx = num(); ry = num()
-            phi = num()
-            large_arc = int(num())
-            sweep = int(num())
-            x2 = num(); y2 = num()
-            if cmd == "a":
-                x2 += x; y2 += y
-            pts = _arc_to_points(x, y, x2, y2, rx, ry, phi, large_arc, sweep, CURVE_SEGMENTS)
-            for p in pts:
-                cur.append(p)
-            x, y = x2, y2
-
-        elif cmd in "Zz":
-            if cur:
-                cur.append((sx, sy))
-                polys.append(cur)
-                cur = []
-            x, y = sx, sy
-
-        else:
+        # Numbers repeat the current command; none yet, or after Z, is malformed
+        if handler is None or handler is close:
             break
+        handler(rel)
 
     if cur:
-        polys.append(cur)
+        polys.append(_stack_points(cur))
     return polys
 
 def svg_to_dxf(svg_path, dxf_path):
     try:
-        tree = ET.parse(svg_path)
+        tree = _load_svg_tree(svg_path)
         root = tree.getroot()
     except Exception as e:
         log(f"[DXF] Failed to parse SVG: {e}")
@@ -1473,8 +1896,12 @@ def svg_to_dxf(svg_path, dxf_path):
     vbw, vbh = _svg_viewbox_size(root)
     polylines = []
 
-    def walk(node, parent_M):
-        M_here = parent_M @ parse_transform(node.get("transform"))
+    # Iterative pre-order walk with an explicit (node, parent matrix) stack
+    stack = [(root, IDENT)]
+    while stack:
+        node, parent_M = stack.pop()
+        t = node.get("transform")
+        M_here = compose(parent_M, parse_transform(t)) if t else parent_M
         tag = _strip_ns(node.tag)
 
         if tag == "path":
@@ -1502,51 +1929,48 @@ def svg_to_dxf(svg_path, dxf_path):
             if w > 0 and h > 0:
                 polylines.append(apply_transform(rect_to_poly(x, y, w, h), M_here))
 
-        for ch in list(node):
-            walk(ch, M_here)
+        # Reversed so children pop in document order
+        stack.extend((ch, M_here) for ch in reversed(node))
 
-    walk(root, np.identity(3, dtype=float))
-
-    polylines = [pl for pl in polylines if pl and len(pl) >= 2]
+    polylines = [pl for pl in polylines if len(pl) >= 2]
     if not polylines:
         log(f"[DXF] No linework in '{svg_path}'")
         return False
 
     try:
-        with open(dxf_path, "w", encoding="utf-8", newline="\n") as f:
-            def w(code, val):
-                f.write(f"{code}\n{val}\n")
-
-            w(0, "SECTION"); w(2, "HEADER")
-            w(9, "$ACADVER"); w(1, "AC1015")
-            w(0, "ENDSEC")
-
-            w(0, "SECTION"); w(2, "ENTITIES")
-
-            for pts in polylines:
-                pts2 = [(x, vbh - y) for x, y in pts]  # Flip Y
-                cleaned = []
-                for p in pts2:
-                    if not cleaned or abs(cleaned[-1][0] - p[0]) > 1e-9 or abs(cleaned[-1][1] - p[1]) > 1e-9:
-                        cleaned.append(p)
-                if len(cleaned) < 2:
-                    continue
+        # Build the whole file as string parts and write it once
+        parts = []
+        def w(code, val):
+            parts.append(f"{code}\n{val}\n")
+
+        w(0, "SECTION"); w(2, "HEADER")
+        w(9, "$ACADVER"); w(1, "AC1015")
+        w(0, "ENDSEC")
+
+        w(0, "SECTION"); w(2, "ENTITIES")
+
+        for pts in polylines:
+            P = np.column_stack((pts[:, 0], vbh - pts[:, 1]))  # Flip Y
+            # Drop consecutive duplicates
+            keep = np.ones(len(P), dtype=bool)
+            keep[1:] = (np.abs(np.diff(P, axis=0)) > 1e-9).any(axis=1)
+            cleaned = P[keep]
+            if len(cleaned) < 2:
+                continue
 
-                closed = 0
-                if len(cleaned) >= 3:
-                    if abs(cleaned[0][0] - cleaned[-1][0]) < 1e-9 and abs(cleaned[0][1] - cleaned[-1][1]) < 1e-9:
-                        closed = 1
+            closed = len(cleaned) >= 3 and bool((np.abs(cleaned[0] - cleaned[-1]) < 1e-9).all())
 
-                w(0, "LWPOLYLINE")
-                w(8, "0")
-                w(90, len(cleaned))
-                w(70, 1 if closed else 0)
-                for x, y in cleaned:
-                    w(10, float(x))
-                    w(20, float(y))
+            w(0, "LWPOLYLINE")
+            w(8, "0")
+            w(90, len(cleaned))
+            w(70, 1 if closed else 0)
+            parts.append("".join([f"10\n{x}\n20\n{y}\n" for x, y in cleaned.tolist()]))
 
-            w(0, "ENDSEC")
-            w(0, "EOF")
+        w(0, "ENDSEC")
+        w(0, "EOF")
+
+        with open(dxf_path, "w", encoding="utf-8", newline="\n") as f:
+            f.write("".join(parts))
 
         log(f"[DXF] Wrote: {dxf_path}")
         return True
@@ -1555,10 +1979,8 @@ def svg_to_dxf(svg_path, dxf_path):
         log(f"[DXF] Failed to write: {e}")
         return False
 
-def svg_to_pdf(svg_path, pdf_path):
-    if not CONVERT_SVG_TO_PDF:
-        return False
-
+@lru_cache(maxsize=1)
+def _find_inkscape():
     inkscape = shutil.which("inkscape") or shutil.which("inkscape.com")
     if not inkscape:
         for guess in [r"C:\Program Files\Inkscape\bin\inkscape.com",
@@ -1566,6 +1988,13 @@ def svg_to_pdf(svg_path, pdf_path):
             if os.path.exists(guess):
                 inkscape = guess
                 break
+    return inkscape
+
+def svg_to_pdf(svg_path, pdf_path):
+    if not CONVERT_SVG_TO_PDF:
+        return False
+
+    inkscape = _find_inkscape()
     if not inkscape:
         log("[PDF] Inkscape not found")
         return False
@@ -1583,36 +2012,97 @@ def svg_to_pdf(svg_path, pdf_path):
         log(f"[PDF] Inkscape failed: {e}")
         return False
 
-def convert_exports_to_dxf_and_pdf(all_export_files):
-    svgs = [p for p in all_export_files if p.lower().endswith(".svg")]
-    for svg in svgs:
-        base = os.path.splitext(svg)[0]
-        dxf = base + ".dxf"
-        pdf = base + ".pdf"
+def _file_stamp(path):
+    try:
+        st = os.stat(path)
+        return (st.st_mtime_ns, st.st_size)
+    except OSError:
+        return None
 
-        # Fix/Embed images first => avoids red X / missing raster in PDF
+def svg_to_pdf_batch(pairs):
+    """
+    Convert (svg, pdf) pairs with one Inkscape process per INKSCAPE_BATCH files
+    (Inkscape 1.x --actions), so startup is paid once. Anything the batch did not
+    write falls back to svg_to_pdf one file at a time.
+    """
+    if not CONVERT_SVG_TO_PDF or not pairs:
+        return 0
+    inkscape = _find_inkscape()
+    if not inkscape:
+        log("[PDF] Inkscape not found")
+        return 0
+
+    pairs = [(os.path.abspath(svg), os.path.abspath(pdf)) for svg, pdf in pairs]
+    before = {pdf: _file_stamp(pdf) for _, pdf in pairs}
+    # ';' separates actions, so such paths can only go the per-file route
+    batch = [(svg, pdf) for svg, pdf in pairs if ";" not in svg + pdf] if len(pairs) >= 2 else []
+    for k in range(0, len(batch), INKSCAPE_BATCH):
+        chunk = batch[k:k + INKSCAPE_BATCH]
+        actions = ";".join(f"file-open:{svg};export-type:pdf;export-filename:{pdf};export-do;file-close" for svg, pdf in chunk)
         try:
-            is_sheet = (SHEET_HINT.lower() in os.path.basename(svg).lower()) and (SHEET_HINT_2.lower() in os.path.basename(svg).lower())
-            if is_sheet:
-                fix_sheet_svg_center_drawing(svg, SHEET_HINT, SHEET_HINT_2)
-            fix_svg_image_hrefs_and_embed(svg, embed=True)
-        except:
-            pass
-
-        # DXF only if it truly contains vector linework
-        if svg_has_vector_linework(svg):
-            try:
-                svg_to_dxf(svg, dxf)
-            except:
-                pass
-        else:
-            log(f"[DXF] Skip raster-only SVG: {svg}")
+            subprocess.run([inkscape, "--batch-process", f"--actions={actions}"],
+                           check=True, cwd=os.path.dirname(chunk[0][0]))
+        except Exception as e:
+            log(f"[PDF] Inkscape batch failed, falling back to per-file: {e}")
+
+    done = 0
+    batched = set(batch)
+    for svg, pdf in pairs:
+        stamp = _file_stamp(pdf)
+        if (svg, pdf) in batched and stamp is not None and stamp != before[pdf]:
+            log(f"[PDF] Wrote: {pdf}")
+            done += 1
+        elif svg_to_pdf(svg, pdf):
+            done += 1
+    return done
+
+def _convert_one_export(svg):
+    base = os.path.splitext(svg)[0]
+    dxf = base + ".dxf"
+
+    # Fix/Embed images first => avoids red X / missing raster in PDF
+    try:
+        name = os.path.basename(svg).lower()
+        if SHEET_HINT.lower() in name and SHEET_HINT_2.lower() in name:
+            fix_sheet_svg_center_drawing(svg)
+        fix_svg_image_hrefs_and_embed(svg, embed=True)
+    except:
+        pass
 
-        # PDF always (after embedding hrefs)
+    # DXF only if it truly contains vector linework
+    if svg_has_vector_linework(svg):
         try:
-            svg_to_pdf(svg, pdf)
+            svg_to_dxf(svg, dxf)
         except:
             pass
+    else:
+        log(f"[DXF] Skip raster-only SVG: {svg}")
+
+def _convert_one_export_buffered(svg):
+    _LOG_BUF.lines = []
+    try:
+        _convert_one_export(svg)
+    finally:
+        lines, _LOG_BUF.lines = _LOG_BUF.lines, None
+    return lines
+
+def convert_exports_to_dxf_and_pdf(all_export_files):
+    svgs = [p for p in all_export_files if p.lower().endswith(".svg")]
+    if not PARALLEL_EXPORT or len(svgs) < 2:
+        for svg in svgs:
+            _convert_one_export(svg)
+    else:
+        # Sheets are independent; file I/O, lxml and NumPy release the GIL.
+        # Threads, not processes: workers would have to re-import this script (and bpy)
+        with ThreadPoolExecutor(max_workers=min(len(svgs), os.cpu_count() or 1)) as ex:
+            for lines in ex.map(_convert_one_export_buffered, svgs):
+                _emit_log_lines(lines)
+
+    # PDF always (after embedding hrefs), all sheets through one Inkscape
+    try:
+        svg_to_pdf_batch([(svg, os.path.splitext(svg)[0] + ".pdf") for svg in svgs])
+    except:
+        pass
 
 
 # =========================
@@ -1642,10 +2132,54 @@ def reload_ifc_in_bonsai(filepath_abs):
         except Exception as e:
             log(f"[BIM] load_project_elements FAIL: {e}")
 
+def wait_bonsai_reload(old_ifc, timeout=0.3):
+    # Poll (10 ms steps) until Bonsai holds a different file object than old_ifc, i.e. the reload has
+    # replaced it; timeout is the fixed pause this replaces, so it never waits longer than before.
+    t0 = time.monotonic()
+    while True:
+        try:
+            if get_ifc() is not old_ifc:
+                return True
+        except:
+            pass
+        if time.monotonic() - t0 >= timeout:
+            log(f"[BIM] Reload not confirmed after {timeout:.1f}s, continuing")
+            return False
+        time.sleep(0.01)
+
 
 # =========================
 # FIX: CAMERA & UPDATE HELPERS
 # =========================
+def _iter_world_shapes(ifc, products):
+    """
+    Yield world-coordinate shapes of products.
+    Uses the multi-threaded geometry iterator; anything it did not deliver goes through create_shape one by one.
+    """
+    settings = ifcgeom.settings()
+    settings.set(settings.USE_WORLD_COORDS, True)
+
+    done = set()
+    try:
+        it = ifcgeom.iterator(settings, ifc, os.cpu_count() or 1, include=products)
+        if it.initialize():
+            while True:
+                shape = it.get()
+                done.add(shape.id)
+                yield shape
+                if not it.next():
+                    break
+    except Exception as e:
+        log(f"[FIX] Geometry iterator failed, falling back to per-element shapes: {e}")
+
+    for p in products:
+        if p.id() in done:
+            continue
+        try:
+            yield ifcgeom.create_shape(settings, p)
+        except:
+            pass
+
 def center_cameras_on_geometry_and_update(ifc):
     """
     1. Calculates the center of generated walls.
@@ -1658,29 +2192,21 @@ def center_cameras_on_geometry_and_update(ifc):
         log("[FIX] No walls found, skipping camera fix.")
         return
 
-    # specific import for geometry calculation
-    import ifcopenshell.geom
-    settings = ifcopenshell.geom.settings()
-    settings.set(settings.USE_WORLD_COORDS, True)
-    
-    min_x, min_y, max_x, max_y = 1e9, 1e9, -1e9, -1e9
+    lo = np.full(2, 1e9); hi = np.full(2, -1e9)
     count = 0
 
-    for w in walls:
+    for shape in _iter_world_shapes(ifc, walls):
         try:
-            shape = ifcopenshell.geom.create_shape(settings, w)
-            verts = shape.geometry.verts # [x,y,z, x,y,z...]
-            xs = verts[0::3]
-            ys = verts[1::3]
-            min_x = min(min_x, min(xs))
-            min_y = min(min_y, min(ys))
-            max_x = max(max_x, max(xs))
-            max_y = max(max_y, max(ys))
+            xy = np.asarray(shape.geometry.verts, dtype=float).reshape(-1, 3)[:, :2] # [x,y,z, x,y,z...]
+            np.minimum(lo, xy.min(axis=0), out=lo)
+            np.maximum(hi, xy.max(axis=0), out=hi)
             count += 1
         except: pass
 
     if count == 0: return
     
+    min_x, min_y = lo.tolist()
+    max_x, max_y = hi.tolist()
     cx = (min_x + max_x) / 2.0
     cy = (min_y + max_y) / 2.0
     width = max_x - min_x
@@ -1756,36 +2282,37 @@ def main():
             log(f"[SETUP] Created missing wall type: {TYPE_WALL}")
 
         # --- Parse SVG ---
-        tree = ET.parse(SVG_PATH)
-        root = tree.getroot()
-        unit_m = compute_svg_unit_to_meter(root)
+        unit_m = compute_svg_unit_to_meter(read_svg_root(SVG_PATH))
 
         walls, wins, doors = [], [], []
-        for cls, poly, eid in iter_floorplan_shapes(root):
-            poly_w = [(p[0]*unit_m, -p[1]*unit_m) for p in poly]  # Flip Y into IFC coords
-            if cls == "wall": walls.append((poly_w, eid))
-            elif cls == "window": wins.append((poly_w, eid))
-            elif cls == "door": doors.append((poly_w, eid))
+        buckets = {"wall": walls, "window": wins, "door": doors}
+        for cls, poly_w, eid in iter_floorplan_shapes(SVG_PATH, scale=(unit_m, -unit_m)):  # Flip Y into IFC coords
+            b = buckets.get(cls)
+            if b is not None:
+                b.append((poly_w, eid))
 
         log(f"[SVG] walls={len(walls)} wins={len(wins)} doors={len(doors)} unit_m={unit_m}")
 
         # --- BUILD WALLS ---
-        wall_recs = []
-        for i, (poly, eid) in enumerate(walls):
-            cx, cy = poly_centroid(poly)
-            poly_loc = [(p[0]-cx, p[1]-cy) for p in poly]
-
-            w = run("root.create_entity", ifc, ifc_class="IfcWall", name=f"{GEN_PREFIX}WALL_{i}")
-            run("spatial.assign_container", ifc, relating_structure=storey, products=[w])
+        # Create all walls first so containment and typing are one API call each, not one per wall
+        wall_ents = [run("root.create_entity", ifc, ifc_class="IfcWall", name=f"{GEN_PREFIX}WALL_{i}") for i in range(len(walls))]
+        if wall_ents:
+            run("spatial.assign_container", ifc, relating_structure=storey, products=wall_ents)
 
             # wall is not mapped from a template model; we use profile rep
-            run("type.assign_type", ifc, related_objects=[w], relating_type=wall_type, should_map_representations=False)
+            run("type.assign_type", ifc, related_objects=wall_ents, relating_type=wall_type, should_map_representations=False)
+
+        M_wall = _ROT_TEMPLATE.copy()  # one placement buffer; only the translation changes per wall
+        for (poly, eid), w in zip(walls, wall_ents):
+            cx, cy = poly_centroid(poly)
+            poly_loc = list(map(tuple, (poly - (cx, cy)).tolist()))  # plain tuples for the IFC API
 
             rep = make_wall_rep_from_poly(ifc, ctx, poly_loc, DEFAULT_WALL_HEIGHT)
             run("geometry.assign_representation", ifc, product=w, representation=rep)
-            place_matrix(ifc, w, np.array([[1,0,0,cx],[0,1,0,cy],[0,0,1,0],[0,0,0,1]], dtype=float))
+            place_matrix(ifc, w, build_xy_rotation_matrix(cx, cy, 0.0, 1.0, 0.0, out=M_wall))
 
-            wall_recs.append({"poly": poly, "ifc": w})
+        # One edge index over all walls for host lookups; hits come back as indices into wall_ents
+        edge_index = build_edge_index([poly for poly, _ in walls])
 
         # --- BUILD WINDOWS/DOORS (hosted) using TEMPLATE TYPE MODELS ---
         def assign_type_mapped_safe(product, ttype):
@@ -1802,79 +2329,79 @@ def main():
             except Exception:
                 return False
 
+        # Openings and elements are contained in the storey with one call after both kinds are built
+        hosted = []
+
+        # Template types by normalized name, looked up per opening
+        win_types = build_type_index(ifc, "IfcWindowType")
+        door_types = build_type_index(ifc, "IfcDoorType")
+
         def build_hosted(items, is_win):
-            cls_name = "IfcWindow" if is_win else "IfcDoor"
-            prefix = "WIN" if is_win else "DOOR"
+            # Everything that only depends on window vs door, decided once per call
+            if is_win:
+                cls_name, prefix, want_kind = "IfcWindow", "WIN", "WINDOW"
+                type_cls, types, default_type = "IfcWindowType", win_types, DEFAULT_WIN_TYPE
+                default_sill, default_height = DEFAULT_FALLBACK_SILL, DEFAULT_FALLBACK_WIN_H
+            else:
+                cls_name, prefix, want_kind = "IfcDoor", "DOOR", "DOOR"
+                type_cls, types, default_type = "IfcDoorType", door_types, DEFAULT_DOOR_TYPE
+                default_sill, default_height = 0.0, DEFAULT_FALLBACK_DOOR_H
+
+            centers = [poly_centroid(poly) for poly, _ in items]
+            hits = closest_edges_in_index(edge_index, centers)
 
             for i, (poly, eid) in enumerate(items):
-                cx, cy = poly_centroid(poly)
+                cx, cy = centers[i]
 
                 kind, type_token, spec_width, sill, height = parse_spec_from_eid(eid)
-                if is_win and kind != "WINDOW":
-                    type_token = DEFAULT_WIN_TYPE
-                    sill = DEFAULT_FALLBACK_SILL
-                    height = DEFAULT_FALLBACK_WIN_H
-                if (not is_win) and kind != "DOOR":
-                    type_token = DEFAULT_DOOR_TYPE
-                    sill = 0.0
-                    height = DEFAULT_FALLBACK_DOOR_H
+                if kind != want_kind:
+                    type_token = default_type
+                    sill = default_sill
+                    height = default_height
 
                 # Host wall
-                best = (1e9, None, None)
-                for rec in wall_recs:
-                    d, edge, t = closest_wall_edge(rec["poly"], cx, cy)
-                    if d < best[0]:
-                        best = (d, rec, edge)
-
-                host = best[1]
-                if not host:
+                d, wi, edge, t = hits[i]
+                host = wall_ents[wi] if wi is not None and d < 1e9 else None
+                if host is None:
                     log(f"[BUILD] WARNING: No host wall found for {prefix} {i}")
                     continue
 
-                ax, ay, bx, by = best[2]
+                ax, ay, bx, by = edge
                 ux, uy = unit(bx - ax, by - ay)
 
                 width = spec_width if spec_width is not None else opening_width_from_rect(poly, ux, uy)
                 if sill is None:
-                    sill = DEFAULT_FALLBACK_SILL if is_win else 0.0
+                    sill = default_sill
                 if height is None:
-                    height = DEFAULT_FALLBACK_WIN_H if is_win else DEFAULT_FALLBACK_DOOR_H
+                    height = default_height
 
                 # Resolve template type
-                if is_win:
-                    ttype = find_type_ci(ifc, "IfcWindowType", type_token)
-                    if not ttype:
-                        log(f"[TYPE] Missing IfcWindowType '{type_token}', fallback '{DEFAULT_WIN_TYPE}'")
-                        ttype = find_type_ci(ifc, "IfcWindowType", DEFAULT_WIN_TYPE)
-                    if not ttype:
-                        # last resort: create (but it will be placeholder)
-                        ttype = run("root.create_entity", ifc, ifc_class="IfcWindowType", name=type_token)
-                        log(f"[TYPE] Created missing IfcWindowType '{type_token}' (WARNING: may be placeholder)")
-                else:
-                    ttype = find_type_ci(ifc, "IfcDoorType", type_token)
-                    if not ttype:
-                        log(f"[TYPE] Missing IfcDoorType '{type_token}', fallback '{DEFAULT_DOOR_TYPE}'")
-                        ttype = find_type_ci(ifc, "IfcDoorType", DEFAULT_DOOR_TYPE)
-                    if not ttype:
-                        ttype = run("root.create_entity", ifc, ifc_class="IfcDoorType", name=type_token)
-                        log(f"[TYPE] Created missing IfcDoorType '{type_token}' (WARNING: may be placeholder)")
+                ttype = find_type_in(types, type_token)
+                if not ttype:
+                    log(f"[TYPE] Missing {type_cls} '{type_token}', fallback '{default_type}'")
+                    ttype = find_type_in(types, default_type)
+                if not ttype:
+                    # last resort: create (but it will be placeholder)
+                    ttype = run("root.create_entity", ifc, ifc_class=type_cls, name=type_token)
+                    types.setdefault(_norm(type_token), ttype)
+                    log(f"[TYPE] Created missing {type_cls} '{type_token}' (WARNING: may be placeholder)")
 
                 log(f"[BUILD] {prefix} {i}: type='{type_token}' width={width:.3f} height={height:.3f} sill={sill:.3f}")
 
                 # Opening
                 op = run("root.create_entity", ifc, ifc_class="IfcOpeningElement", name=f"{GEN_PREFIX}OP_{prefix}_{i}")
-                run("spatial.assign_container", ifc, relating_structure=storey, products=[op])
+                hosted.append(op)
                 op_rep = make_opening_rep(ifc, ctx, width, DEFAULT_OPENING_DEPTH_ACROSS_WALL, height)
                 run("geometry.assign_representation", ifc, product=op, representation=op_rep)
                 Mop = build_xy_rotation_matrix(cx, cy, sill, ux, uy)
                 place_matrix(ifc, op, Mop)
 
                 # Add opening to wall
-                run("feature.add_feature", ifc, feature=op, element=host["ifc"])
+                run("feature.add_feature", ifc, feature=op, element=host)
 
                 # Element (Door/Window) - mapped from TEMPLATE TYPE model
                 el = run("root.create_entity", ifc, ifc_class=cls_name, name=f"{GEN_PREFIX}{prefix}_{i}_{eid}")
-                run("spatial.assign_container", ifc, relating_structure=storey, products=[el])
+                hosted.append(el)
 
                 ok_map = assign_type_mapped_safe(el, ttype)
                 if not ok_map:
@@ -1896,15 +2423,19 @@ def main():
 
         build_hosted(wins, True)
         build_hosted(doors, False)
+        if hosted:
+            run("spatial.assign_container", ifc, relating_structure=storey, products=hosted)
 
         # --- WRITE IFC BEFORE ANY BIM OPS (CRITICAL) ---
-        os.makedirs(os.path.dirname(os.path.abspath(OUT_IFC)), exist_ok=True)
-        ifc.write(OUT_IFC)
-        try_set_bonsai_ifc_path(OUT_IFC)
+        out_abs = os.path.abspath(OUT_IFC)
+        os.makedirs(os.path.dirname(out_abs), exist_ok=True)
+        ifc.write(out_abs)
+        try_set_bonsai_ifc_path(out_abs)
+        flush_log()  # build log on disk before Bonsai takes over
 
  # --- Reload so Blender shows the new elements ---
-        reload_ifc_in_bonsai(os.path.abspath(OUT_IFC))
-        time.sleep(0.3)
+        reload_ifc_in_bonsai(out_abs)
+        wait_bonsai_reload(ifc)
 
         # >>>>>> ADDED FIX HERE <<<<<<
         # Move camera to the new walls and force the 2D linework generation
@@ -1931,6 +2462,7 @@ def main():
 
     finally:
         bpy.context.preferences.edit.use_global_undo = old_undo
+        flush_log()
 
 
 try:
@@ -1938,4 +2470,5 @@ try:
 except Exception as e:
     log(f"FAIL: {e}")
     log(traceback.format_exc())
+    flush_log()
     raise